@@ -0,0 +1,221 @@
+import time
+
+from frontend.shared_segmentation_controller import shared_segmentation
+
+from .tile_planner import plan_tiles
+
+
+class AutoTuner:
+    """
+    Closed-loop controller that holds each camera's result rate at a
+    target: frames per second coming out of the detection worker, whether
+    inferred or propagated by the tracker. It is a result rate, not an
+    inference rate, on purpose: every result moves the boxes on screen and
+    can alert, and the stride is the tuner's last lever for keeping results
+    flowing when inference cannot. Raising it lowers inference, but the
+    tracker still forces an inference whenever its tracks become uncertain.
+    Every `interval` seconds the tuner compares the measured rates with the
+    target and moves one step along a ladder of settings:
+
+    - too slow: a coarser segmentation grid first, then a larger inference
+      stride on the cameras that are behind
+    - keeping up with headroom to spare: the same steps in reverse
+
+    The detection input size follows the grid: tiles are cut from the
+    smallest resolution at which they are still at least as large as the
+    network input, so downscaling never costs detail the network would see.
+
+    A grid chosen by the operator in the settings is never changed until
+    the operator hands it back (the Auto segment button). Strides keep
+    being tuned so the rate target still holds.
+    """
+
+    def __init__(self, processor, worker, target_fps=10.0, resolutions=(), max_segments=25, max_stride=6,
+                 interval=2.0, band=0.15, headroom=0.7):
+        """
+        Args:
+            processor (ImageProcessor): Processor whose detection size is tuned
+            worker (DetectionWorker): Worker whose strides are tuned and whose
+                counters are measured
+            target_fps (float): Detection rate to hold per camera
+            resolutions (list of tuple): Candidate (width, height) detection
+                sizes, as parsed by application.get_resolution
+            max_segments (int): Largest grid the tuner will move up to
+            max_stride (int): Largest inference stride the tuner will set
+            interval (float): Seconds of measurement between decisions
+            band (float): Fraction under the target a camera may fall before
+                the tuner steps down
+            headroom (float): Worker busy fraction under which the tuner steps up
+        """
+        self.processor = processor
+        self.worker = worker
+        self.target_fps = float(target_fps)
+        self.resolutions = sorted(set(tuple(r) for r in resolutions))
+        self.max_stride = max(1, int(max_stride))
+        self.interval = interval
+        self.band = band
+        self.headroom = headroom
+        self.enabled = True
+
+        self.grid_ladder = [s for s in sorted(shared_segmentation.get_options()) if s <= max_segments]
+        # Windows to wait before stepping up again, doubled every time a
+        # step up has to be taken back so the tuner does not oscillate
+        self._upgrade_backoff = 1
+        self._upgrade_wait = 0
+        self._last_step = None
+        self._window_start = None
+        self._window_stats = None
+        self.last_rates = []
+
+    def set_enabled(self, enabled):
+        print(f"[AutoTuner] {'enabled' if enabled else 'disabled'}")
+        self.enabled = enabled
+        self._window_start = None
+
+    def tick(self, now=None):
+        """
+        Call regularly from the UI loop. Measures the last window and, once
+        per interval, takes at most one tuning step.
+        """
+        now = time.time() if now is None else now
+        stats = self.worker.get_stats()
+        if self._window_start is None:
+            self._window_start, self._window_stats = now, stats
+            return
+        elapsed = now - self._window_start
+        if elapsed < self.interval:
+            return
+
+        previous = self._window_stats
+        self._window_start, self._window_stats = now, stats
+        rates = [(b - a) / elapsed for a, b in zip(previous["camera_frames"], stats["camera_frames"])]
+        offered = [(b - a) / elapsed for a, b in zip(previous["submitted"], stats["submitted"])]
+        busy = (stats["busy_time"] - previous["busy_time"]) / elapsed
+        self.last_rates = rates
+        if not self.enabled:
+            return
+        self._sync_detection_size()
+
+        # A camera cannot be detected faster than it delivers frames
+        targets = [min(self.target_fps, rate) for rate in offered]
+        lagging = [
+            camera_id for camera_id, (rate, target) in enumerate(zip(rates, targets))
+            if target > 0 and rate < target * (1 - self.band)
+        ]
+        if lagging:
+            if self._last_step == "up":
+                self._upgrade_backoff = min(self._upgrade_backoff * 2, 32)
+            self._step_down(lagging, rates, targets)
+            self._upgrade_wait = self._upgrade_backoff
+        elif busy < self.headroom:
+            if self._upgrade_wait > 0:
+                self._upgrade_wait -= 1
+                return
+            self._step_up(busy)
+        else:
+            self._last_step = None
+            self._upgrade_backoff = max(1, self._upgrade_backoff // 2)
+
+    def _step_down(self, lagging, rates, targets):
+        summary = ", ".join(f"camera {c + 1} {rates[c]:.1f}/{targets[c]:.1f} fps" for c in lagging)
+        inx = self._grid_index()
+        if inx is not None and inx > 0:
+            self._set_grid(self.grid_ladder[inx - 1], f"behind target ({summary})")
+            self._last_step = "down"
+            return
+
+        strides = self.worker.strides
+        raised = [c for c in lagging if strides[c] < self.max_stride]
+        for camera_id in raised:
+            self.worker.set_stride(camera_id, strides[camera_id] + 1)
+        if raised:
+            print(f"[AutoTuner] behind target ({summary}): stride -> "
+                  + ", ".join(f"camera {c + 1}: {strides[c]}" for c in raised))
+            self._last_step = "down"
+        else:
+            print(f"[AutoTuner] behind target ({summary}) with every setting at its limit")
+            self._last_step = None
+
+    def _step_up(self, busy):
+        reason = f"headroom (worker {busy:.0%} busy)"
+        strides = self.worker.strides
+        lowered = [c for c, stride in enumerate(strides) if stride > 1]
+        if lowered:
+            for camera_id in lowered:
+                self.worker.set_stride(camera_id, strides[camera_id] - 1)
+            print(f"[AutoTuner] {reason}: stride -> "
+                  + ", ".join(f"camera {c + 1}: {strides[c]}" for c in lowered))
+            self._last_step = "up"
+            return
+
+        inx = self._grid_index()
+        if inx is not None and inx < len(self.grid_ladder) - 1:
+            self._set_grid(self.grid_ladder[inx + 1], reason)
+            self._last_step = "up"
+            return
+        self._last_step = None
+
+    def _grid_index(self):
+        """
+        Returns:
+            int: Position of the current grid on the ladder, None while the
+            grid is not the tuner's to change
+        """
+        if shared_segmentation.has_operator_override() or not shared_segmentation.is_enabled():
+            return None
+        segments = shared_segmentation.get_current_segments()
+        if segments not in self.grid_ladder:
+            return None
+        return self.grid_ladder.index(segments)
+
+    def _set_grid(self, segments, reason):
+        shared_segmentation.set_current(segments, operator=False)
+        print(f"[AutoTuner] {reason}: grid -> {segments} segments")
+        self._sync_detection_size()
+
+    def _sync_detection_size(self):
+        """
+        Keep the processor's detection size matched to the active grid,
+        whoever chose it.
+        """
+        size = self.detection_size_for(shared_segmentation.get_active_grid())
+        if size != self.processor.detection_size:
+            self.processor.set_detection_size(size)
+            size_text = "capture resolution" if size is None else f"{size[0]}x{size[1]}"
+            print(f"[AutoTuner] detection size -> {size_text}")
+
+    def detection_size_for(self, grid_size):
+        """
+        Args:
+            grid_size (tuple): (rows, cols) of the grid, None for whole-frame
+
+        Returns:
+            tuple: Smallest candidate (width, height) whose tiles are still at
+            least the network input size, None to use capture resolution
+        """
+        frame_size = self._frame_size()
+        if grid_size is None or frame_size is None:
+            return None
+        frame_width, frame_height = frame_size
+        input_width, input_height = self.processor.input_size
+        overlap = shared_segmentation.get_overlap()
+        for width, height in self.resolutions:
+            if width >= frame_width:
+                break
+            height = max(1, round(width * frame_height / frame_width))
+            tiles = plan_tiles(height, width, tuple(grid_size), overlap)
+            if min(t[3] - t[1] for t in tiles) >= input_width and min(t[4] - t[2] for t in tiles) >= input_height:
+                return width, height
+        return None
+
+    def _frame_size(self):
+        """
+        Returns:
+            tuple: Largest (width, height) among the cameras' latest results
+        """
+        sizes = []
+        for camera_id in range(len(self.worker.pending)):
+            result = self.worker.get_latest_result(camera_id)
+            if result is not None:
+                sizes.append(result.pyramid.size)
+        return max(sizes) if sizes else None
@@ -1,57 +1,334 @@
 import cv2
+import json
 import os
+import threading
+import time
+from pathlib import Path
 
+BY_ID_DIR = "/dev/v4l/by-id"
 
-def find_working_cameras(desired_resolutions, max_devices=12, max_cams=6):
+
+class CameraProbe:
+    """
+    What a camera negotiated while being probed, so CameraManager can open
+    it with the same settings without trying codecs again.
+    """
+
+    __slots__ = ("device", "codec", "width", "height", "fps", "cached")
+
+    def __init__(self, device, codec, width, height, fps, cached=False):
+        self.device = device
+        self.codec = codec
+        # Resolution and frame rate the driver actually granted
+        self.width = width
+        self.height = height
+        self.fps = fps
+        # True when taken from the CameraCache without opening the device
+        self.cached = cached
+
+    def __repr__(self):
+        source = ", cached" if self.cached else ""
+        return f"CameraProbe({self.device}, {self.codec}, {self.width}x{self.height} @ {self.fps:g} fps{source})"
+
+
+def fourcc_name(cap):
+    """
+    Returns:
+        str: FOURCC the driver is delivering on an open capture, e.g. "MJPG"
+    """
+    fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+    return "".join(chr((fourcc >> (8 * inx)) & 0xFF) for inx in range(4))
+
+
+def device_identities():
+    """
+    Returns:
+        dict: /dev/videoN -> stable identity, the /dev/v4l/by-id link of the
+        device (USB vendor, model and serial) where udev made one, else the
+        device path itself
+    """
+    identities = {}
+    for link in sorted(Path(BY_ID_DIR).glob("*")):
+        identities.setdefault(os.path.realpath(link), str(link))
+    return identities
+
+
+def identity_device(identity):
+    """
+    Returns:
+        str: The /dev/videoN a device identity currently points at, the
+        identity itself when it is a plain device path
+    """
+    return os.path.realpath(identity)
+
+
+class CameraCache:
+    """
+    Probe results persisted between launches, keyed by device identity
+    (see device_identities) so a camera is recognised whichever /dev/videoN
+    it enumerates as. Each entry holds the working codec, resolution and fps
+    for a requested resolution, and the last /dev/videoN it was seen at.
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): JSON file the cache is kept in
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        try:
+            with Path(path).open() as file:
+                self.entries = json.load(file)
+        except FileNotFoundError:
+            pass
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"[CameraCache] Could not read {path}, starting empty: {e}")
+
+    def lookup(self, identity, device, resolution):
+        """
+        Returns:
+            CameraProbe: The cached settings of the camera at `device`, None
+            when it is unknown or was probed for another resolution
+        """
+        with self._lock:
+            entry = self.entries.get(identity)
+        if entry is None or tuple(entry["requested"]) != tuple(resolution):
+            return None
+        return CameraProbe(device, entry["codec"], entry["width"], entry["height"], entry["fps"], cached=True)
+
+    def record(self, identity, probe, resolution):
+        """
+        Store a working probe as the last known good settings of a camera.
+        """
+        with self._lock:
+            self.entries[identity] = {
+                "device": probe.device,
+                "requested": list(resolution),
+                "codec": probe.codec,
+                "width": probe.width,
+                "height": probe.height,
+                "fps": probe.fps,
+                "last_ok": time.time(),
+            }
+        self.save()
+
+    def forget(self, identity):
+        """
+        Drop a camera that no longer works with its cached settings, so the
+        next launch probes it again.
+        """
+        with self._lock:
+            removed = self.entries.pop(identity, None)
+        if removed is not None:
+            self.save()
+
+    def devices(self):
+        """
+        Returns:
+            list of str: Current /dev/videoN of every cached camera, resolved
+            from its identity
+        """
+        with self._lock:
+            return sorted(identity_device(identity) for identity in self.entries)
+
+    def save(self):
+        with self._lock:
+            entries = dict(self.entries)
+        try:
+            with Path(self.path).open("w") as file:
+                json.dump(entries, file, indent=4)
+        except OSError as e:
+            print(f"[CameraCache] Could not write {self.path}: {e}")
+
+
+def find_working_cameras(desired_resolutions, max_devices=12, max_cams=6, workers=4, timeout=5.0,
+                         codecs=("MJPG", "YUYV"), fps=30, cache=None):
     """
-    Scan /dev/video* and return up to `max_cams` working camera paths.
+    Probe /dev/video* concurrently and return up to `max_cams` working
+    cameras. At most `workers` devices are opened at once; a device that has
+    not answered `timeout` seconds after its probe started is given up on
+    and its slot handed to the next device. Probe threads are daemons, so a
+    driver call that never returns cannot hold up startup or shutdown.
+
+    With a cache, cameras it knows are returned straight from it without
+    being opened (marked `cached`, to be revalidated by the caller) and
+    only new or previously failed devices are probed. Working probes are
+    added to the cache.
 
     Args:
+        desired_resolutions (list of tuples): Resolutions to try in order of preference
         max_devices (int): How many /dev/video* devices to check (default: 12)
         max_cams (int): How many working cameras to return (default: 6)
-        desired_resolutions (list of tuples): Resolutions to try in order of preference
+        workers (int): Devices probed at the same time
+        timeout (float): Seconds a single device may take
+        codecs (tuple): FOURCC codes to try in order of preference
+        fps (int): Frame rate to request
+        cache (CameraCache, optional): Capability cache to use and update
 
     Returns:
-        List[str]: List of working camera device paths
+        List[CameraProbe]: Working cameras in device order
     """
-    working_cams = []
+    devices = [f"/dev/video{i}" for i in range(max_devices) if os.path.exists(f"/dev/video{i}")]
+    results = {}
+    if cache is not None:
+        identities = device_identities()
+        for device in devices:
+            probe = cache.lookup(identities.get(device, device), device, desired_resolutions[0])
+            if probe is not None:
+                print(f"[{device}] Using cached {probe.codec} {probe.width}x{probe.height}")
+                results[device] = probe
+        # Nothing left to find once the cache alone fills the rig
+        unknown = [] if len(results) >= max_cams else [d for d in devices if d not in results]
+        probed = _probe_devices(unknown, desired_resolutions, workers, timeout, codecs, fps)
+        for device, probe in probed.items():
+            if probe is not None:
+                cache.record(identities.get(device, device), probe, desired_resolutions[0])
+        results.update(probed)
+    else:
+        results = _probe_devices(devices, desired_resolutions, workers, timeout, codecs, fps)
 
-    for i in range(max_devices):
-        device = f"/dev/video{i}"
-        if not os.path.exists(device):
-            continue
+    working_cams = [results[device] for device in devices if results.get(device) is not None]
+    return working_cams[:max_cams]
+
+
+def _probe_devices(devices, desired_resolutions, workers, timeout, codecs, fps):
+    """
+    Returns:
+        dict: device -> CameraProbe, None for devices that failed or hung
+    """
+    slots = threading.Semaphore(max(1, workers))
+    lock = threading.Lock()
+    # device -> probe start time, result (None for failed) and whether its slot was freed
+    started, results, released = {}, {}, set()
+
+    def release(device):
+        with lock:
+            if device in released:
+                return
+            released.add(device)
+        slots.release()
 
+    def run(device):
+        slots.acquire()
+        with lock:
+            started[device] = time.time()
+        try:
+            probe = probe_camera(device, desired_resolutions, codecs, fps)
+        except Exception as e:
+            print(f"[{device}] Probe failed: {e}")
+            probe = None
+        with lock:
+            results[device] = probe
+        release(device)
+
+    for device in devices:
         print(f"Trying {device}...")
+        threading.Thread(target=run, args=(device,), daemon=True).start()
+
+    pending = set(devices)
+    while pending:
+        now = time.time()
+        with lock:
+            done = {device for device in pending if device in results}
+            hung = {
+                device for device in pending - done
+                if device in started and now - started[device] > timeout
+            }
+        for device in hung:
+            print(f"[{device}] No answer within {timeout:g} seconds, skipped")
+            release(device)
+        pending -= done | hung
+        if pending:
+            time.sleep(0.02)
 
-        if try_camera(device, desired_resolutions, "MJPG", fps=15):
-            print(f"[{device}] MJPG works")
-            working_cams.append(device)
-        elif try_camera(device, desired_resolutions, "YUYV", fps=15):
-            print(f"[{device}] MJPG failed, using YUYV")
-            working_cams.append(device)
-        else:
-            print(f"[{device}] Failed with both MJPG and YUYV")
+    with lock:
+        return {device: results.get(device) for device in devices}
 
-        if len(working_cams) >= max_cams:
-            break
 
-    return working_cams
+def revalidate_cameras(cameras, cache, desired_resolutions, timeout=5.0, codecs=("MJPG", "YUYV"), fps=30):
+    """
+    Confirm that cameras opened from cached settings deliver frames. Meant
+    to run on a background thread after startup. A camera that delivers a
+    frame within `timeout` has its cache entry refreshed; one that does not
+    is released, dropped from the cache and probed from scratch.
+
+    Args:
+        cameras (list of tuple): (CameraManager, CameraProbe) pairs opened from the cache
+        cache (CameraCache): Cache to update
+        desired_resolutions (list of tuples): Resolutions to try when re-probing
+
+    Returns:
+        list of tuple: (CameraManager, CameraProbe) of the failed cameras
+        with their new probe, None when the camera no longer works at all
+    """
+    identities = device_identities()
+    deadline = time.time() + timeout
+    failed = []
+    for camera, probe in cameras:
+        identity = identities.get(probe.device, probe.device)
+        while camera.get_latest()[0] == 0 and time.time() < deadline:
+            time.sleep(0.05)
+        if camera.get_latest()[0] > 0:
+            cache.record(identity, probe, desired_resolutions[0])
+            continue
+
+        print(f"[{probe.device}] No frames with cached settings, probing again")
+        cache.forget(identity)
+        camera.release()
+        new_probe = probe_camera(probe.device, desired_resolutions, codecs, fps)
+        if new_probe is not None:
+            cache.record(identity, new_probe, desired_resolutions[0])
+        failed.append((camera, new_probe))
+    return failed
+
+
+def probe_camera(device, resolutions, codecs=("MJPG", "YUYV"), fps=30):
+    """
+    Returns:
+        CameraProbe: The first codec and resolution that delivers frames,
+        None when the device works with none of them
+    """
+    for inx, codec in enumerate(codecs):
+        probe = try_camera(device, resolutions, codec, fps)
+        if probe is not None:
+            if inx > 0:
+                print(f"[{device}] {', '.join(codecs[:inx])} failed, using {probe.codec}")
+            else:
+                print(f"[{device}] {probe.codec} works")
+            return probe
+    print(f"[{device}] Failed with {' and '.join(codecs)}")
+    return None
 
 
 def try_camera(device, resolutions, codec, fps=30):
+    """
+    Returns:
+        CameraProbe: The settings the driver granted once a frame was read
+        after requesting `codec`, None when no resolution delivered a frame.
+        The codec is the one the driver negotiated, which may differ from
+        the one requested.
+    """
     cap = cv2.VideoCapture(device, cv2.CAP_V4L2)
-    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*codec))
-    cap.set(cv2.CAP_PROP_FPS, fps)
-
-    for width, height in resolutions:
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    try:
+        if not cap.isOpened():
+            return None
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*codec))
+        cap.set(cv2.CAP_PROP_FPS, fps)
 
-        ret, frame = cap.read()
-        if ret and frame is not None and frame.shape[0] >= 100:
-            print(f"✓ {device} works at {width}x{height} with {codec}")
-            cap.release()
-            return True
+        for width, height in resolutions:
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
 
-    cap.release()
-    return False
+            ret, frame = cap.read()
+            if ret and frame is not None and frame.shape[0] >= 100:
+                height, width = frame.shape[:2]
+                negotiated = fourcc_name(cap)
+                if negotiated != codec:
+                    print(f"[{device}] Asked for {codec}, driver gave {negotiated}")
+                print(f"✓ {device} works at {width}x{height} with {negotiated}")
+                return CameraProbe(device, negotiated, width, height, cap.get(cv2.CAP_PROP_FPS) or fps)
+        return None
+    finally:
+        cap.release()
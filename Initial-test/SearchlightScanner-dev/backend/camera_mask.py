@@ -0,0 +1,151 @@
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+
+class CameraMask:
+    """
+    Static inference mask for one camera: pixels that always show the
+    airframe, a wing or empty sky. The mask is stored at low resolution
+    and mapped onto whatever capture resolution the camera runs at.
+
+    Per-tile coverage is computed once per tile plan from an integral image
+    and cached, so per-frame cost is a table lookup. Detections are checked
+    by looking up their box centre, one lookup per detection.
+    """
+
+    def __init__(self, mask):
+        """
+        Args:
+            mask (np.ndarray): 2D array, non-zero where inference should be ignored
+        """
+        self.mask = np.asarray(mask) > 0
+        self.height, self.width = self.mask.shape
+        integral = cv2.integral(self.mask.astype(np.uint8))
+        self._integral = integral.astype(np.float64)
+        self._coverage = {}
+
+    @classmethod
+    def load(cls, path):
+        """
+        Returns:
+            CameraMask: The mask stored in a greyscale image, None if it cannot be read
+        """
+        mask = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+        if mask is None:
+            print(f"[CameraMask] Could not read mask {path}")
+            return None
+        return cls(mask)
+
+    def save(self, path):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        cv2.imwrite(path, self.mask.astype(np.uint8) * 255)
+
+    def tile_coverage(self, tiles, frame_width, frame_height):
+        """
+        Args:
+            tiles (tuple): Tile plan from tile_planner.plan_tiles
+            frame_width (int): Width of the frame the plan was made for
+            frame_height (int): Height of the frame the plan was made for
+
+        Returns:
+            np.ndarray: Fraction of each tile that is masked
+        """
+        key = (tiles, frame_width, frame_height)
+        coverage = self._coverage.get(key)
+        if coverage is not None:
+            return coverage
+
+        corners = np.array([tile[1:] for tile in tiles], dtype=np.float64).reshape(-1, 4)
+        corners[:, [0, 2]] *= self.width / frame_width
+        corners[:, [1, 3]] *= self.height / frame_height
+        x1 = np.clip(np.floor(corners[:, 0]), 0, self.width - 1).astype(np.intp)
+        y1 = np.clip(np.floor(corners[:, 1]), 0, self.height - 1).astype(np.intp)
+        x2 = np.clip(np.ceil(corners[:, 2]), x1 + 1, self.width).astype(np.intp)
+        y2 = np.clip(np.ceil(corners[:, 3]), y1 + 1, self.height).astype(np.intp)
+        integral = self._integral
+        sums = integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]
+        coverage = sums / ((x2 - x1) * (y2 - y1))
+        self._coverage[key] = coverage
+        return coverage
+
+    def masked_tiles(self, tiles, frame_width, frame_height):
+        """
+        Returns:
+            np.ndarray: Boolean mask of the tiles that are completely masked
+        """
+        return self.tile_coverage(tiles, frame_width, frame_height) >= 1.0
+
+    def masked_centres(self, boxes, frame_width, frame_height):
+        """
+        Args:
+            boxes (np.ndarray): (K, 4) left, top, right, bottom in frame coordinates
+
+        Returns:
+            np.ndarray: Boolean mask of the boxes whose centre is masked
+        """
+        boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        cx = (boxes[:, 0] + boxes[:, 2]) * (0.5 * self.width / frame_width)
+        cy = (boxes[:, 1] + boxes[:, 3]) * (0.5 * self.height / frame_height)
+        cx = np.clip(cx.astype(np.intp), 0, self.width - 1)
+        cy = np.clip(cy.astype(np.intp), 0, self.height - 1)
+        return self.mask[cy, cx]
+
+
+class HorizonMaskLearner:
+    """
+    Learns a sky mask from the first frames of a camera. In each frame the
+    horizon is taken per column as the row of the strongest vertical
+    brightness edge; the median over `frames` frames gives a horizon line,
+    and everything more than `margin` above it is masked.
+    """
+
+    def __init__(self, frames=30, margin=0.03, level_width=320, min_edge=20.0):
+        """
+        Args:
+            frames (int): Frames to learn from
+            margin (float): Band above the horizon, as a fraction of the frame
+                height, that stays unmasked
+            level_width (int): Width of the pyramid level used, also the mask width
+            min_edge (float): Weakest mean edge response that counts as a horizon
+        """
+        self.frames = frames
+        self.margin = margin
+        self.level_width = level_width
+        self.min_edge = min_edge
+        self._rows = []
+        self._seen = 0
+
+    def update(self, pyramid):
+        """
+        Args:
+            pyramid (FramePyramid): Pyramid of the next frame
+
+        Returns:
+            CameraMask: The learned mask once enough frames were seen, else None.
+            A camera without a clear horizon learns an empty mask.
+        """
+        grey = pyramid.grey(self.level_width)
+        edges = np.abs(cv2.Sobel(cv2.GaussianBlur(grey, (5, 5), 0), cv2.CV_32F, 0, 1, ksize=3))
+        rows = edges.argmax(axis=0)
+        strength = edges[rows, np.arange(edges.shape[1])]
+        self._seen += 1
+        if strength.mean() >= self.min_edge:
+            self._rows.append(rows)
+        if self._seen < self.frames:
+            return None
+
+        height, width = grey.shape
+        mask = np.zeros((height, width), dtype=np.uint8)
+        # Only trust a horizon seen clearly in most of the frames
+        if len(self._rows) > self.frames // 2:
+            horizon = np.median(np.stack(self._rows), axis=0)
+            # A straight line through the per-column medians smooths over masts and waves
+            columns = np.arange(width)
+            slope, intercept = np.polyfit(columns, horizon, 1)
+            line = slope * columns + intercept - self.margin * height
+            mask[np.arange(height)[:, None] < line[None, :]] = 255
+        self._rows = []
+        self._seen = 0
+        return CameraMask(mask)
@@ -0,0 +1,168 @@
+import time
+
+import cv2
+import numpy as np
+
+from .nms import iou_matrix
+
+
+def _normalise(size):
+    width, height = size
+    return np.array([[1.0 / width, 0, 0], [0, 1.0 / height, 0], [0, 0, 1]])
+
+
+def estimate_overlap(frame_a, frame_b, min_matches=25):
+    """
+    Estimate how the field of view of camera A maps onto camera B from one
+    frame of each, with ORB features and a RANSAC homography. Meant for the
+    rig calibration (calibrate_overlaps.py), not the live loop.
+
+    Args:
+        frame_a (np.ndarray): BGR frame of camera A
+        frame_b (np.ndarray): BGR frame of camera B, captured at the same time
+        min_matches (int): Inlier matches needed to accept the overlap
+
+    Returns:
+        list: Row-major 3x3 homography from A to B in normalised (0-1)
+        coordinates, None when the cameras do not overlap
+    """
+    orb = cv2.ORB_create(2000)
+    grey_a = cv2.cvtColor(frame_a, cv2.COLOR_BGR2GRAY)
+    grey_b = cv2.cvtColor(frame_b, cv2.COLOR_BGR2GRAY)
+    keypoints_a, descriptors_a = orb.detectAndCompute(grey_a, None)
+    keypoints_b, descriptors_b = orb.detectAndCompute(grey_b, None)
+    if descriptors_a is None or descriptors_b is None:
+        return None
+
+    matches = cv2.BFMatcher(cv2.NORM_HAMMING, crossCheck=True).match(descriptors_a, descriptors_b)
+    if len(matches) < min_matches:
+        return None
+    points_a = np.float32([keypoints_a[m.queryIdx].pt for m in matches])
+    points_b = np.float32([keypoints_b[m.trainIdx].pt for m in matches])
+    homography, inliers = cv2.findHomography(points_a, points_b, cv2.RANSAC, 5.0)
+    if homography is None or inliers.sum() < min_matches:
+        return None
+
+    size_a = (frame_a.shape[1], frame_a.shape[0])
+    size_b = (frame_b.shape[1], frame_b.shape[0])
+    normalised = _normalise(size_b) @ homography @ np.linalg.inv(_normalise(size_a))
+    return (normalised / normalised[2, 2]).ravel().tolist()
+
+
+class CrossCameraAssociator:
+    """
+    Suppresses duplicate alerts from cameras with overlapping fields of
+    view. Alerting results from a camera that overlaps another are held for
+    `window` seconds. A held result is dropped when every alerting detection
+    in it is also seen by an overlapping camera within the window with a
+    better view (confidence times frame quality); otherwise it is released.
+    Results from cameras without a calibrated neighbour pass straight
+    through.
+    """
+
+    def __init__(self, overlaps, window=0.5, iou_threshold=0.3):
+        """
+        Args:
+            overlaps (dict): (camera_a, camera_b) -> 3x3 homography mapping
+                normalised coordinates of camera A onto camera B. Both
+                directions are derived from one entry.
+            window (float): Seconds within which two sightings are the same event
+            iou_threshold (float): Overlap of the mapped boxes needed to
+                call two detections the same object
+        """
+        self.window = window
+        self.iou_threshold = iou_threshold
+        self.homographies = {}
+        for (camera_a, camera_b), homography in overlaps.items():
+            homography = np.asarray(homography, dtype=np.float64).reshape(3, 3)
+            self.homographies[(camera_a, camera_b)] = homography
+            self.homographies[(camera_b, camera_a)] = np.linalg.inv(homography)
+        self._partners = {}
+        for camera_a, camera_b in self.homographies:
+            self._partners.setdefault(camera_a, set()).add(camera_b)
+        # (release time, result, alert set) waiting for the window to close
+        self._pending = []
+        # Results released or dropped recently, still compared against newcomers
+        self._recent = []
+        self.suppressed = 0
+
+    def push(self, result, alerts):
+        """
+        Args:
+            result (DetectionResult): An inferred result with something to alert on
+            alerts (DetectionSet): The detections of the result that alert
+        """
+        self._pending.append((time.time() + self.window, result, alerts))
+
+    def pop_ready(self, now=None):
+        """
+        Returns:
+            list of tuple: (result, alerts) to pass downstream, in arrival order
+        """
+        now = time.time() if now is None else now
+        self._recent = [entry for entry in self._recent if entry[1].timestamp > now - 2 * self.window]
+        ready = []
+        waiting = []
+        for entry in self._pending:
+            release_at, result, alerts = entry
+            if result.camera_id in self._partners and release_at > now:
+                waiting.append(entry)
+                continue
+            if self._has_better_view(result, alerts, self._pending + self._recent):
+                self.suppressed += 1
+                print(f"[CrossCameraAssociator] Camera {result.camera_id + 1} alert suppressed, "
+                      f"a neighbouring camera has a better view")
+            else:
+                ready.append((result, alerts))
+            self._recent.append(entry)
+        self._pending = waiting
+        return ready
+
+    def _has_better_view(self, result, alerts, others):
+        """
+        Returns:
+            bool: True when every alert of `result` is matched by a better
+            scored detection on an overlapping camera within the window
+        """
+        partners = self._partners.get(result.camera_id)
+        if not partners or not len(alerts):
+            return False
+        boxes = self._normalised_boxes(alerts, result)
+        scores = alerts.confs * self._quality(result)
+        covered = np.zeros(len(alerts), dtype=bool)
+        for _, other, other_alerts in others:
+            if other is result or other.camera_id not in partners or not len(other_alerts):
+                continue
+            if abs(other.timestamp - result.timestamp) > self.window:
+                continue
+            mapped = self._map_boxes(boxes, self.homographies[(result.camera_id, other.camera_id)])
+            iou = iou_matrix(mapped, self._normalised_boxes(other_alerts, other))
+            same = (iou >= self.iou_threshold) & (alerts.class_ids[:, None] == other_alerts.class_ids[None, :])
+            other_scores = other_alerts.confs * self._quality(other)
+            # Ties go to the lower camera number so exactly one view survives
+            better = (other_scores[None, :] > scores[:, None]) | (
+                (other_scores[None, :] == scores[:, None]) & (other.camera_id < result.camera_id)
+            )
+            covered |= (same & better).any(axis=1)
+        return bool(covered.all())
+
+    @staticmethod
+    def _quality(result):
+        return result.quality.score if result.quality is not None else 1.0
+
+    @staticmethod
+    def _normalised_boxes(detections, result):
+        return detections.boxes / (result.pyramid.width, result.pyramid.height,
+                                   result.pyramid.width, result.pyramid.height)
+
+    @staticmethod
+    def _map_boxes(boxes, homography):
+        """
+        Map (K, 4) normalised boxes through a homography and return the
+        axis-aligned boxes around their mapped corners.
+        """
+        corners = np.stack([
+            boxes[:, [0, 1]], boxes[:, [2, 1]], boxes[:, [2, 3]], boxes[:, [0, 3]],
+        ], axis=1).reshape(-1, 1, 2).astype(np.float64)
+        mapped = cv2.perspectiveTransform(corners, homography).reshape(-1, 4, 2)
+        return np.concatenate([mapped.min(axis=1), mapped.max(axis=1)], axis=1)
@@ -0,0 +1,90 @@
+import cv2
+import numpy as np
+
+
+class TileChangeDetector:
+    """
+    Cheap per-tile change detector for one camera. Each frame's low
+    resolution pyramid level is compared against a running background model
+    and tiles whose mean absolute difference stays under `threshold` are
+    reported as static. A tile that has not run for `refresh_interval`
+    frames is reported as changed so nothing starves. Refresh counters only
+    restart for the tiles that actually ran, fed back through mark_run, so
+    a tile a tile budget skipped stays due.
+    """
+
+    def __init__(self, threshold=6.0, refresh_interval=10, alpha=0.1, level_width=320):
+        """
+        Args:
+            threshold (float): Mean absolute grey level difference (0-255)
+                above which a tile counts as changed
+            refresh_interval (int): Frames after which a static tile is run anyway
+            alpha (float): Learning rate of the running background
+            level_width (int): Width of the pyramid level the comparison runs on
+        """
+        self.threshold = threshold
+        self.refresh_interval = max(1, int(refresh_interval))
+        self.alpha = alpha
+        self.level_width = level_width
+        self.background = None
+        self.frames_since_run = None
+        self.tiles = None
+        self._tile_corners = None
+
+    def update(self, pyramid, tiles):
+        """
+        Args:
+            pyramid (FramePyramid): Pyramid of the current frame
+            tiles (tuple): Tile plan from tile_planner.plan_tiles
+
+        Returns:
+            np.ndarray: Boolean mask, True for tiles that must be inferred
+            this frame (changed or due for a refresh)
+        """
+        grey = pyramid.grey(self.level_width).astype(np.float32)
+
+        if self.background is None or self.background.shape != grey.shape or tiles is not self.tiles:
+            self.background = grey
+            # Every tile is due until it has run once
+            self.frames_since_run = np.full(len(tiles), self.refresh_interval, dtype=np.int32)
+            self.tiles = tiles
+            self._tile_corners = self._scale_tiles(tiles, pyramid, grey.shape)
+            return np.ones(len(tiles), dtype=bool)
+
+        # Mean difference per tile from one integral image, no per-pixel loop per tile
+        integral = cv2.integral(cv2.absdiff(grey, self.background))
+        x1, y1, x2, y2 = self._tile_corners
+        sums = integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]
+        means = sums / np.maximum((x2 - x1) * (y2 - y1), 1)
+
+        self.frames_since_run += 1
+        active = (means > self.threshold) | (self.frames_since_run >= self.refresh_interval)
+
+        cv2.accumulateWeighted(grey, self.background, self.alpha)
+        return active
+
+    def mark_run(self, ran):
+        """
+        Restart the refresh counters of the tiles inferred this frame.
+
+        Args:
+            ran (np.ndarray): Boolean mask of the tiles that were run
+        """
+        if self.frames_since_run is not None and len(ran) == len(self.frames_since_run):
+            self.frames_since_run[ran] = 0
+
+    @staticmethod
+    def _scale_tiles(tiles, pyramid, level_shape):
+        """
+        Map full resolution tile corners onto the low resolution level.
+        """
+        level_height, level_width = level_shape
+        corners = np.array([tile[1:] for tile in tiles], dtype=np.float64)
+        corners[:, [0, 2]] *= level_width / pyramid.width
+        corners[:, [1, 3]] *= level_height / pyramid.height
+        corners = np.round(corners).astype(np.intp)
+        x1 = np.clip(corners[:, 0], 0, level_width - 1)
+        y1 = np.clip(corners[:, 1], 0, level_height - 1)
+        x2 = np.clip(np.maximum(corners[:, 2], x1 + 1), 1, level_width)
+        y2 = np.clip(np.maximum(corners[:, 3], y1 + 1), 1, level_height)
+        return x1, y1, x2, y2
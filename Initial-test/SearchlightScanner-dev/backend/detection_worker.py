@@ -0,0 +1,320 @@
+import queue
+import threading
+import time
+
+from frontend.shared_segmentation_controller import shared_segmentation
+
+from .tracker import Sort
+
+
+class LatestWinsQueue:
+    """
+    Bounded single-slot queue. Putting a new item replaces the one waiting,
+    so a slow consumer always works on the newest frame instead of a backlog.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._item = None
+        self.dropped = 0
+
+    def put(self, item):
+        with self._lock:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = item
+
+    def take(self):
+        """
+        Returns:
+            The waiting item (removing it from the slot), or None if empty.
+        """
+        with self._lock:
+            item, self._item = self._item, None
+            return item
+
+    def has_item(self):
+        with self._lock:
+            return self._item is not None
+
+
+class DetectionResult:
+    def __init__(self, camera_id, frame_id, timestamp, pyramid, detections, new_tracks, inferred=True):
+        self.camera_id = camera_id
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+        self.pyramid = pyramid
+        # Boxes are in the full resolution coordinates of the pyramid
+        self.detections = detections
+        # Detections that started a new track, alerts and saves key on these
+        self.new_tracks = new_tracks
+        # False when the boxes were propagated by the tracker instead of detected
+        self.inferred = inferred
+        # (tiles_run, tiles_skipped) by the change gate, None for whole-frame detection
+        self.tile_stats = None
+        # Stage timings (ms) and this camera's crop count when the cascade ran, else None
+        self.cascade_stats = None
+        # FrameQuality of the frame when a quality scorer is set, else None
+        self.quality = None
+
+    def age(self):
+        return time.time() - self.timestamp
+
+
+class DetectionWorker:
+    """
+    Runs the image processor on its own thread so inference never blocks the
+    Tk main loop. Each camera has a LatestWinsQueue of pending frames and
+    results are handed back to the UI through a thread-safe queue.
+    """
+
+    def __init__(self, processor, num_cameras, stride=1, tracker_params=None, quality_scorer=None,
+                 max_low_quality_skips=5):
+        """
+        Args:
+            processor (ImageProcessor): Runs the detection
+            num_cameras (int): Number of camera feeds
+            stride (int): Run inference on every Nth frame a camera hands over,
+                the tracker propagates boxes in between. A camera is inferred
+                sooner when its tracks become uncertain. Each camera starts at
+                this stride, see set_stride.
+            tracker_params (dict, optional): Keyword arguments for each Sort tracker
+            quality_scorer (FrameQualityScorer, optional): Scores every frame;
+                blurred or badly exposed frames that are due for inference are
+                tracked instead
+            max_low_quality_skips (int): Low quality frames in a row a camera
+                may skip before one is inferred anyway, so a camera staring
+                into the sun is deprioritised rather than blinded
+        """
+        self.processor = processor
+        self.stride = max(1, int(stride))
+        self.strides = [self.stride] * num_cameras
+        self.pending = [LatestWinsQueue() for _ in range(num_cameras)]
+        self.trackers = [
+            Sort(processor.labels, camera_id, **(tracker_params or {}))
+            for camera_id in range(num_cameras)
+        ]
+        self._frames_since_inference = [self.stride] * num_cameras
+        # (width, height) of the last frame of each camera, None before the first
+        self._frame_sizes = [None] * num_cameras
+        self.quality_scorer = quality_scorer
+        self.max_low_quality_skips = max_low_quality_skips
+        self._low_quality_skips = [0] * num_cameras
+        self.low_quality_frames = 0
+        self.inferred_frames = 0
+        self.tracked_frames = 0
+        self.tiles_run = 0
+        self.tiles_skipped = 0
+        self.cascade_crops = 0
+        # Per camera counters and the time spent detecting, read by the auto tuner
+        self.submitted = [0] * num_cameras
+        self.camera_frames = [0] * num_cameras
+        self.camera_inferred = [0] * num_cameras
+        self.busy_time = 0.0
+        self.results = queue.Queue()
+        self._latest_results = {}
+        self._results_lock = threading.Lock()
+        self._work_available = threading.Condition()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        print("Starting detection worker")
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        with self._work_available:
+            self._work_available.notify()
+        if self.thread:
+            self.thread.join(timeout=2)
+
+    def submit(self, camera_id, frame_id, timestamp, pyramid):
+        """
+        Queue a frame for detection, replacing any older frame from the same
+        camera that has not been picked up yet.
+
+        Args:
+            camera_id (int): Index of the camera in camera_feeds
+            frame_id (int): Frame counter from the camera's capture slot
+            timestamp (float): Capture time of the frame
+            pyramid (FramePyramid): Pyramid of the captured frame
+        """
+        self.submitted[camera_id] += 1
+        self.pending[camera_id].put((frame_id, timestamp, pyramid))
+        with self._work_available:
+            self._work_available.notify()
+
+    def set_stride(self, camera_id, stride):
+        """
+        Change how often one camera runs inference.
+
+        Args:
+            camera_id (int): Index of the camera in camera_feeds
+            stride (int): Infer every Nth frame, 1 infers every frame
+        """
+        self.strides[camera_id] = max(1, int(stride))
+
+    def get_results(self):
+        """
+        Drain every result published since the last call.
+
+        Returns:
+            List[DetectionResult]: Results in the order they were produced
+        """
+        results = []
+        while True:
+            try:
+                results.append(self.results.get_nowait())
+            except queue.Empty:
+                return results
+
+    def get_latest_result(self, camera_id):
+        with self._results_lock:
+            return self._latest_results.get(camera_id)
+
+    def run(self):
+        while self.running:
+            with self._work_available:
+                while self.running and not any(p.has_item() for p in self.pending):
+                    self._work_available.wait(timeout=0.5)
+            if not self.running:
+                break
+
+            batch = {}
+            for camera_id, pending in enumerate(self.pending):
+                item = pending.take()
+                if item is not None:
+                    batch[camera_id] = item
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            try:
+                self._track_or_detect(batch)
+            except Exception as e:
+                print(f"[DetectionWorker] Detection error: {e}")
+            self.busy_time += time.perf_counter() - started
+
+    def _track_or_detect(self, batch):
+        """
+        Propagate tracks on cameras that are between inference frames and
+        send the rest through the processor in one batch.
+
+        Args:
+            batch (dict): camera_id -> (frame_id, timestamp, pyramid)
+        """
+        to_detect = {}
+        qualities = {}
+        for camera_id, (frame_id, timestamp, pyramid) in batch.items():
+            self._check_frame_size(camera_id, pyramid)
+            tracker = self.trackers[camera_id]
+            predicted = tracker.predict(timestamp)
+            self._frames_since_inference[camera_id] += 1
+            quality = self.quality_scorer.score(pyramid) if self.quality_scorer else None
+            qualities[camera_id] = quality
+            due = self._frames_since_inference[camera_id] >= self.strides[camera_id] or tracker.is_uncertain()
+            if (due and quality is not None and not quality.usable
+                    and self._low_quality_skips[camera_id] < self.max_low_quality_skips):
+                self._low_quality_skips[camera_id] += 1
+                self.low_quality_frames += 1
+                due = False
+            if due:
+                self._low_quality_skips[camera_id] = 0
+                to_detect[camera_id] = batch[camera_id]
+                continue
+
+            self.tracked_frames += 1
+            result = DetectionResult(
+                camera_id, frame_id, timestamp, pyramid, predicted,
+                predicted.select(slice(0, 0)), inferred=False,
+            )
+            result.quality = quality
+            self._publish(result)
+
+        if to_detect:
+            self._detect(to_detect, qualities)
+
+    def _check_frame_size(self, camera_id, pyramid):
+        """
+        Start a camera afresh when its capture resolution changed: tracks and
+        tile state are in the old coordinates, so the first frame at the new
+        size is inferred from scratch.
+        """
+        size = pyramid.size
+        previous = self._frame_sizes[camera_id]
+        self._frame_sizes[camera_id] = size
+        if previous is None or previous == size:
+            return
+        print(f"[DetectionWorker] Camera {camera_id + 1} resolution {previous[0]}x{previous[1]} "
+              f"-> {size[0]}x{size[1]}")
+        self.trackers[camera_id].reset()
+        self.processor.reset_camera(camera_id)
+        self._frames_since_inference[camera_id] = self.strides[camera_id]
+
+    def _detect(self, batch, qualities=None):
+        """
+        Run every pending camera frame through the processor in one batch.
+
+        Args:
+            batch (dict): camera_id -> (frame_id, timestamp, pyramid)
+            qualities (dict, optional): camera_id -> FrameQuality of the frames
+        """
+        frames = {camera_id: pyramid for camera_id, (_, _, pyramid) in batch.items()}
+        batch_results = self.processor.detect_batch(
+            frames,
+            grid_size=shared_segmentation.get_active_grid(),
+            overlap=shared_segmentation.get_overlap(),
+        )
+        for camera_id, detections in batch_results.items():
+            frame_id, timestamp, pyramid = batch[camera_id]
+            new_tracks = self.trackers[camera_id].update(detections, timestamp)
+            self._frames_since_inference[camera_id] = 0
+            self.inferred_frames += 1
+            self.camera_inferred[camera_id] += 1
+            result = DetectionResult(camera_id, frame_id, timestamp, pyramid, detections, new_tracks)
+            result.quality = (qualities or {}).get(camera_id)
+            result.tile_stats = self.processor.last_tile_stats.get(camera_id)
+            if result.tile_stats:
+                self.tiles_run += result.tile_stats[0]
+                self.tiles_skipped += result.tile_stats[1]
+            if self.processor.cascade:
+                stats = self.processor.last_cascade_stats
+                result.cascade_stats = {
+                    "proposal_ms": stats["proposal_ms"],
+                    "refine_ms": stats["refine_ms"],
+                    "crops": stats["crops"].get(camera_id, 0),
+                }
+                self.cascade_crops += result.cascade_stats["crops"]
+            self._publish(result)
+
+    def _publish(self, result):
+        self.camera_frames[result.camera_id] += 1
+        with self._results_lock:
+            self._latest_results[result.camera_id] = result
+        self.results.put(result)
+
+    def get_stats(self):
+        """
+        Returns:
+            dict: Stale frames dropped per camera, how many frames were
+            inferred versus propagated by the trackers and how many tiles the
+            change gate ran versus skipped, plus the per camera counters and
+            busy time the auto tuner turns into rates
+        """
+        return {
+            "dropped": {camera_id: p.dropped for camera_id, p in enumerate(self.pending)},
+            "inferred_frames": self.inferred_frames,
+            "tracked_frames": self.tracked_frames,
+            "tiles_run": self.tiles_run,
+            "tiles_skipped": self.tiles_skipped,
+            "cascade_crops": self.cascade_crops,
+            "low_quality_frames": self.low_quality_frames,
+            "submitted": list(self.submitted),
+            "camera_frames": list(self.camera_frames),
+            "camera_inferred": list(self.camera_inferred),
+            "strides": list(self.strides),
+            "busy_time": self.busy_time,
+        }
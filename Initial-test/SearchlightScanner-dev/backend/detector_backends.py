@@ -0,0 +1,360 @@
+import tempfile
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from .nms import non_max_suppression
+
+try:
+    import jetson_inference
+    from jetson_utils import (
+        cudaAllocMapped,
+        cudaCrop,
+        cudaDeviceSynchronize,
+        cudaToNumpy,
+    )
+except ImportError:
+    jetson_inference = None
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+
+# pytorch-ssd mobilenet preprocessing: (pixel - 127) / 128
+SSD_MEAN = 127.0
+SSD_SCALE = 1.0 / 128.0
+
+# Weight precisions the CPU backend can load, see precision_model_path
+PRECISIONS = ("fp32", "fp16", "int8")
+
+
+def preprocess_images(images, input_size, buffers=None):
+    """
+    Pack RGB images into one NCHW float32 blob the way the SSD-Mobilenet
+    export expects it. Shared by the CPU backend and the quantisation
+    calibration so both see identical inputs.
+
+    Args:
+        images (list of np.ndarray): RGB images or regions, any size
+        input_size (tuple): (width, height) of the model input
+        buffers (dict, optional): Staging and blob arrays kept between calls,
+            keyed by batch size. Images are resized straight into them, so a
+            steady batch size allocates nothing; the returned blob is then
+            overwritten by the next call.
+
+    Returns:
+        np.ndarray: (N, 3, height, width) float32 blob
+    """
+    width, height = input_size
+    count = len(images)
+    staging, blob = buffers.get(count, (None, None)) if buffers is not None else (None, None)
+    if staging is None:
+        staging = np.empty((count, height, width, 3), dtype=np.uint8)
+        blob = np.empty((count, 3, height, width), dtype=np.float32)
+        if buffers is not None:
+            buffers[count] = staging, blob
+    for inx, image in enumerate(images):
+        if image.shape[:2] == (height, width):
+            staging[inx] = image
+        else:
+            cv2.resize(image, (width, height), dst=staging[inx])
+    np.subtract(staging.transpose(0, 3, 1, 2), SSD_MEAN, out=blob)
+    blob *= SSD_SCALE
+    return blob
+
+
+def precision_model_path(model_path, precision):
+    """
+    Returns:
+        str: Path of the model converted to `precision`, stored next to the
+        FP32 model (models/ssd-mobilenet.int8.onnx for int8)
+    """
+    if precision == "fp32":
+        return model_path
+    path = Path(model_path)
+    return str(path.with_name(f"{path.stem}.{precision}{path.suffix}"))
+
+
+def cuda_image_to_numpy(image):
+    """
+    Read a jetson_utils cudaImage as a host array.
+
+    Returns:
+        np.ndarray: RGB uint8 image, sharing memory with `image` for rgb8
+
+    Raises:
+        TypeError: When `image` is not a cudaImage, jetson_utils is not
+            installed or the image is not rgb8 or rgba8
+    """
+    if jetson_inference is None or not hasattr(image, "format"):
+        raise TypeError(f"Expected a numpy image or a jetson_utils cudaImage, got {type(image).__name__}")
+    if image.format not in ("rgb8", "rgba8"):
+        raise TypeError(f"Unsupported cudaImage format {image.format}, expected rgb8 or rgba8")
+    # Kernels still writing the image must finish before the CPU reads it
+    cudaDeviceSynchronize()
+    array = cudaToNumpy(image)
+    return cv2.cvtColor(array, cv2.COLOR_RGBA2RGB) if image.format == "rgba8" else array
+
+
+class DetectorBackend:
+    """
+    Interface for the network that runs inside ImageProcessor.
+
+    A backend takes a list of jobs, each an RGB image and an optional region
+    of interest (left, top, right, bottom) inside it, and returns one
+    (K, 6) float32 array per job with rows of
+    (class_id, confidence, left, top, right, bottom) in region coordinates.
+    Class ids index the label list the backend was created with.
+
+    `class_mask`, when set, is a boolean array indexed by class id; rows of
+    any other class are dropped as soon as the raw output is decoded.
+    """
+
+    name = "base"
+    input_size = (300, 300)
+    class_mask = None
+
+    def detect(self, jobs):
+        raise NotImplementedError
+
+    def _allowed(self, class_ids):
+        """
+        Returns:
+            np.ndarray: Boolean mask of the class ids that pass class_mask
+        """
+        mask = self.class_mask
+        class_ids = np.asarray(class_ids, dtype=np.intp)
+        if mask is None:
+            return np.ones(len(class_ids), dtype=bool)
+        in_table = (class_ids >= 0) & (class_ids < len(mask))
+        return in_table & mask[np.clip(class_ids, 0, len(mask) - 1)]
+
+
+class JetsonDetectNetBackend(DetectorBackend):
+    """
+    detectNet on the Jetson GPU. Each distinct image is copied once into a
+    mapped upload buffer and regions are cropped on the GPU, both into
+    buffers reused across calls.
+    """
+
+    name = "jetson"
+
+    def __init__(self, model_path, labels, colors):
+        if jetson_inference is None:
+            raise ImportError("jetson_inference is not installed")
+        self._roi_buffers = {}
+        self._upload_buffers = {}
+
+        # detectNet reads the label and colour files while loading the model
+        with tempfile.TemporaryDirectory() as temp_dir:
+            temp_label_file = Path(temp_dir) / "labels.txt"
+            temp_color_file = Path(temp_dir) / "colors.txt"
+            temp_label_file.write_text('\n'.join(labels))
+            temp_color_file.write_text('\n'.join([f"{r} {g} {b}" for (r, g, b) in colors]))
+
+            if model_path and Path(model_path).exists():
+                print(f"Loading custom model from: {model_path}")
+                self.net = jetson_inference.detectNet(
+                    model=model_path,
+                    labels=str(temp_label_file),
+                    colors=str(temp_color_file),
+                    input_blob="input_0",
+                    output_cvg="scores",
+                    output_bbox="boxes",
+                    threshold=0.01
+                )
+            else:
+                print("Using built-in ssd-mobilenet-v2 model")
+                self.net = jetson_inference.detectNet(
+                    "ssd-mobilenet-v2",
+                    labels=str(temp_label_file),
+                    colors=str(temp_color_file),
+                    threshold=0.01
+                )
+
+            if not hasattr(self.net, 'SetThreshold'):
+                print("Warning: detectNet doesn't have SetThreshold method")
+
+    def detect(self, jobs):
+        uploads = {}
+        outputs = []
+        for job_inx, (image, roi) in enumerate(jobs):
+            cuda_image = uploads.get(id(image))
+            if cuda_image is None:
+                cuda_image = self._upload(len(uploads), image)
+                uploads[id(image)] = cuda_image
+            if roi is not None:
+                cuda_image = self._crop(job_inx, cuda_image, roi)
+
+            detections = self.net.Detect(cuda_image, overlay="none")
+            rows = np.array(
+                [(d.ClassID, d.Confidence, d.Left, d.Top, d.Right, d.Bottom) for d in detections],
+                dtype=np.float32,
+            ).reshape(-1, 6)
+            outputs.append(rows if self.class_mask is None else rows[self._allowed(rows[:, 0])])
+        return outputs
+
+    def _upload(self, key, image):
+        """
+        Copy an RGB image into a mapped buffer kept between frames, instead
+        of allocating a new CUDA image for every upload.
+        """
+        height, width = image.shape[:2]
+        buffer, array = self._upload_buffers.get(key, (None, None))
+        if buffer is None or buffer.width != width or buffer.height != height:
+            buffer = cudaAllocMapped(width=width, height=height, format="rgb8")
+            array = cudaToNumpy(buffer)
+            self._upload_buffers[key] = buffer, array
+        np.copyto(array, image)
+        return buffer
+
+    def _crop(self, key, cuda_image, roi):
+        left, top, right, bottom = roi
+        width, height = right - left, bottom - top
+        buffer = self._roi_buffers.get(key)
+        if buffer is None or buffer.width != width or buffer.height != height:
+            buffer = cudaAllocMapped(width=width, height=height, format=cuda_image.format)
+            self._roi_buffers[key] = buffer
+        cudaCrop(cuda_image, buffer, (left, top, right, bottom))
+        return buffer
+
+
+class OnnxCpuBackend(DetectorBackend):
+    """
+    The same SSD-Mobilenet ONNX export (input_0 -> scores, boxes) run on the
+    CPU with onnxruntime, or with OpenCV's DNN module when onnxruntime is not
+    installed. Regions are sliced as views and packed into batched input
+    blobs of up to `max_batch` images.
+    """
+
+    name = "cpu"
+    min_confidence = 0.01
+    nms_threshold = 0.45
+
+    def __init__(self, model_path, threads=None, max_batch=8, runtime=None):
+        if not model_path or not Path(model_path).exists():
+            raise FileNotFoundError(f"ONNX model not found at: {model_path}")
+        self.model_path = model_path
+        self.threads = threads
+        self.max_batch = max(1, int(max_batch))
+        # Reused preprocessing buffers, see preprocess_images
+        self._buffers = {}
+
+        if runtime is None:
+            runtime = "onnxruntime" if onnxruntime is not None else "opencv"
+        self.runtime = runtime
+
+        if runtime == "onnxruntime":
+            options = onnxruntime.SessionOptions()
+            if threads:
+                options.intra_op_num_threads = int(threads)
+            self.session = onnxruntime.InferenceSession(
+                model_path, sess_options=options, providers=["CPUExecutionProvider"]
+            )
+            model_input = self.session.get_inputs()[0]
+            self.input_name = model_input.name
+            self.input_size = (int(model_input.shape[3]), int(model_input.shape[2]))
+            # Exports with a fixed batch dimension of 1 cannot take batched blobs
+            if isinstance(model_input.shape[0], int) and model_input.shape[0] == 1:
+                self.max_batch = 1
+        else:
+            if threads:
+                cv2.setNumThreads(int(threads))
+            self.net = cv2.dnn.readNetFromONNX(model_path)
+            self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+            self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        print(f"[OnnxCpuBackend] Loaded {model_path} with {runtime}, threads={threads}, max_batch={self.max_batch}")
+
+    def detect(self, jobs):
+        regions = []
+        for image, roi in jobs:
+            if roi is not None:
+                left, top, right, bottom = roi
+                image = image[top:bottom, left:right]
+            regions.append(image)
+
+        outputs = []
+        for start in range(0, len(regions), self.max_batch):
+            chunk = regions[start:start + self.max_batch]
+            scores, boxes = self._forward(chunk)
+            for inx, region in enumerate(chunk):
+                outputs.append(self._decode(scores[inx], boxes[inx], region.shape[1], region.shape[0]))
+        return outputs
+
+    def _forward(self, images):
+        blob = preprocess_images(images, self.input_size, self._buffers)
+        if self.runtime == "onnxruntime":
+            scores, boxes = self.session.run(["scores", "boxes"], {self.input_name: blob})
+            return scores, boxes
+
+        try:
+            self.net.setInput(blob, "input_0")
+            scores, boxes = self.net.forward(["scores", "boxes"])
+        except cv2.error:
+            if len(images) == 1:
+                raise
+            print("[OnnxCpuBackend] Batched input not supported by this model, running one image per call")
+            self.max_batch = 1
+            results = [self._forward([image]) for image in images]
+            return (np.concatenate([r[0] for r in results]),
+                    np.concatenate([r[1] for r in results]))
+        return scores, boxes
+
+    def _decode(self, scores, boxes, width, height):
+        """
+        Turn one image's (anchors, classes) softmax scores and normalised
+        corner boxes into detection rows, with per-class NMS as detectNet does.
+        """
+        class_ids = scores[:, 1:].argmax(axis=1) + 1  # skip BACKGROUND
+        confidences = scores[np.arange(len(scores)), class_ids]
+        mask = (confidences >= self.min_confidence) & self._allowed(class_ids)
+        if not mask.any():
+            return np.empty((0, 6), dtype=np.float32)
+
+        class_ids = class_ids[mask]
+        confidences = confidences[mask]
+        pixel_boxes = boxes[mask] * np.array([width, height, width, height], dtype=np.float32)
+        keep, kept_boxes = non_max_suppression(pixel_boxes, confidences, class_ids, self.nms_threshold)
+        return np.column_stack(
+            (class_ids[keep], confidences[keep], kept_boxes)
+        ).astype(np.float32)
+
+
+def create_backend(name, model_path, labels, colors, threads=None, max_batch=8, precision="fp32"):
+    """
+    Build the detector backend named in the settings.
+
+    Args:
+        name (str): "jetson", "cpu", "onnxruntime", "opencv" or "auto" (Jetson
+            when jetson_inference is available, CPU otherwise)
+        model_path (str): Path to the ONNX model
+        labels (list of str): Class labels, index is the class id
+        colors (list of tuple): Overlay colours per class (Jetson only)
+        threads (int, optional): CPU intra-op threads
+        max_batch (int): Largest batched input for the CPU backend
+        precision (str): Weights the CPU backend loads, "fp32", "fp16" or
+            "int8" (built with quantize_model.py). Falls back to FP32 when the
+            converted model is missing. The Jetson backend ignores it,
+            TensorRT picks its own precision.
+
+    Returns:
+        DetectorBackend: The created backend
+    """
+    if name == "auto":
+        name = "jetson" if jetson_inference is not None else "cpu"
+
+    if name == "jetson":
+        return JetsonDetectNetBackend(model_path, labels, colors)
+    if name in ("cpu", "onnxruntime", "opencv"):
+        runtime = None if name == "cpu" else name
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown model precision: {precision}")
+        converted_path = precision_model_path(model_path, precision)
+        if not Path(converted_path).exists():
+            print(f"[create_backend] No {precision} model at {converted_path}, using FP32")
+            converted_path = model_path
+        return OnnxCpuBackend(converted_path, threads=threads, max_batch=max_batch, runtime=runtime)
+    raise ValueError(f"Unknown detector backend: {name}")
@@ -0,0 +1,261 @@
+import threading
+
+import cv2
+import numpy as np
+
+# Pixel formats a FramePyramid holds and hands out. "mjpeg" is only ever a
+# source format, it is decoded to "bgr".
+PIXEL_FORMATS = ("bgr", "rgb", "gray", "mjpeg")
+
+# cvtColor code for every (from, to) pair of decoded formats
+_CONVERSIONS = {
+    ("bgr", "rgb"): cv2.COLOR_BGR2RGB,
+    ("rgb", "bgr"): cv2.COLOR_RGB2BGR,
+    ("bgr", "gray"): cv2.COLOR_BGR2GRAY,
+    ("rgb", "gray"): cv2.COLOR_RGB2GRAY,
+    ("gray", "rgb"): cv2.COLOR_GRAY2RGB,
+    ("gray", "bgr"): cv2.COLOR_GRAY2BGR,
+}
+
+# libjpeg DCT scaling factors cv2.imdecode can decode at, largest first
+REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+# Per thread resize targets for levels that only feed a conversion, keyed by
+# (shape, pixel format) and reused from frame to frame
+_scratch = threading.local()
+
+
+def _scratch_buffer(shape, pixel_format):
+    """
+    Returns:
+        np.ndarray: uint8 buffer of the given shape owned by the calling
+        thread, overwritten by its next call with the same shape and format
+    """
+    buffers = getattr(_scratch, "buffers", None)
+    if buffers is None:
+        buffers = _scratch.buffers = {}
+    key = (shape, pixel_format)
+    buffer = buffers.get(key)
+    if buffer is None:
+        buffer = buffers[key] = np.empty(shape, dtype=np.uint8)
+    return buffer
+
+
+def is_encoded(frame):
+    """
+    Returns:
+        bool: True for a compressed buffer as returned by a capture with
+        CAP_PROP_CONVERT_RGB off (a flat or 1xN uint8 array), False for a
+        decoded image
+    """
+    return frame.dtype == np.uint8 and (frame.ndim == 1 or (frame.ndim == 2 and frame.shape[0] == 1))
+
+
+def jpeg_size(buffer):
+    """
+    Read the image size from the start-of-frame marker of a JPEG without
+    decoding it.
+
+    Returns:
+        tuple: (width, height), None when no start-of-frame marker is found
+    """
+    data = memoryview(np.ascontiguousarray(buffer).reshape(-1))
+    inx = 2
+    while inx + 9 < len(data):
+        if data[inx] != 0xFF:
+            return None
+        marker = data[inx + 1]
+        if marker == 0xFF:
+            inx += 1
+            continue
+        length = (data[inx + 2] << 8) | data[inx + 3]
+        # SOF0-SOF15, except DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height = (data[inx + 5] << 8) | data[inx + 6]
+            width = (data[inx + 7] << 8) | data[inx + 8]
+            return width, height
+        inx += 2 + length
+    return None
+
+
+class FramePyramid:
+    """
+    The one frame object passed through the pipeline. It records the pixel
+    format of its source ("bgr" from OpenCV capture, "rgb", "gray" or a
+    compressed "mjpeg" buffer) and hands out views in whatever format and
+    size a consumer asks for. Each (format, size) view is computed at most
+    once, on first request, and then shared by every consumer: the full
+    resolution RGB level for tiled detection, the model input level for
+    whole-frame detection, the display level for the UI and the grey
+    levels for the change detector and the quality scorer.
+
+    Views are resized straight from the source and converted afterwards,
+    in place where the channel count allows it, so each frame is converted
+    once per view and the conversion runs on the small image. A resize that
+    only feeds a grey conversion goes into a per thread buffer reused by
+    every frame. Views themselves are new arrays, since consumers keep them
+    after the next frame arrives. Detection boxes are kept in full
+    resolution coordinates.
+
+    A compressed MJPEG source is decoded with libjpeg DCT scaling at the
+    smallest of 1/8, 1/4 or 1/2 scale that still covers the view, and the
+    full resolution decode only happens when a tiled pass or a save asks
+    for it.
+    """
+
+    def __init__(self, source, timestamp=0.0, pixel_format=None):
+        """
+        Args:
+            source (np.ndarray): Captured frame, or a compressed MJPEG buffer
+            timestamp (float): Capture time
+            pixel_format (str, optional): Format of `source`, one of
+                PIXEL_FORMATS. Guessed when not given: "mjpeg" for compressed
+                buffers, "gray" for 2D images, "bgr" otherwise.
+        """
+        if pixel_format is None:
+            pixel_format = "mjpeg" if is_encoded(source) else "gray" if source.ndim == 2 else "bgr"
+        if pixel_format not in PIXEL_FORMATS:
+            raise ValueError(f"Unknown pixel format: {pixel_format}")
+        self.source = source
+        self.pixel_format = pixel_format
+        self.timestamp = timestamp
+        size = jpeg_size(source) if pixel_format == "mjpeg" else None
+        if pixel_format == "mjpeg" and size is None:
+            # Unknown layout, decode once to learn the size
+            self.source = cv2.imdecode(source, cv2.IMREAD_COLOR)
+            self.pixel_format = "bgr"
+        if self.encoded:
+            self.width, self.height = size
+        else:
+            self.height, self.width = self.source.shape[:2]
+        self._views = {}
+        self._lock = threading.Lock()
+
+    @property
+    def encoded(self):
+        return self.pixel_format == "mjpeg"
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    def full(self):
+        """
+        Returns:
+            np.ndarray: RGB frame at capture resolution
+        """
+        return self.view("rgb", self.width, self.height)
+
+    def resized(self, width, height):
+        """
+        Args:
+            width (int): Level width in pixels
+            height (int): Level height in pixels
+
+        Returns:
+            np.ndarray: RGB frame at the requested size, shared with every
+            other caller asking for the same size. Callers must not modify it.
+        """
+        return self.view("rgb", width, height)
+
+    def grey(self, width):
+        """
+        Args:
+            width (int): Level width in pixels, the height keeps the aspect ratio
+
+        Returns:
+            np.ndarray: uint8 grey level, shared by the change detector and the
+            quality scorer. Callers must not modify it.
+        """
+        return self.view("gray", width, max(1, round(width * self.height / self.width)))
+
+    def bgr(self):
+        """
+        Returns:
+            np.ndarray: BGR frame at capture resolution, decoded if needed
+        """
+        return self.view("bgr", self.width, self.height)
+
+    def view(self, pixel_format, width=None, height=None):
+        """
+        Args:
+            pixel_format (str): "bgr", "rgb" or "gray"
+            width (int, optional): View width, capture width when not given
+            height (int, optional): View height, capture height when not given
+
+        Returns:
+            np.ndarray: The frame in that format and size, shared with every
+            other caller asking for the same view, possibly the source
+            itself. Callers must not modify it.
+        """
+        key = (pixel_format, int(width or self.width), int(height or self.height))
+        with self._lock:
+            view = self._views.get(key)
+        if view is not None:
+            return view
+
+        # Built outside the lock so a slow full resolution view on the
+        # detection thread never stalls the UI asking for its display level
+        view = self._build_view(*key)
+        with self._lock:
+            return self._views.setdefault(key, view)
+
+    def _build_view(self, pixel_format, width, height):
+        base, base_format = self._decoded(width, height)
+        if (width, height) != (base.shape[1], base.shape[0]):
+            interpolation = cv2.INTER_AREA if width < base.shape[1] else cv2.INTER_LINEAR
+            if pixel_format == "gray" and base_format != "gray":
+                # Only the converted grey level is kept, the resize is scratch
+                dst = _scratch_buffer((height, width) + base.shape[2:], base_format)
+                base = cv2.resize(base, (width, height), dst=dst, interpolation=interpolation)
+            else:
+                base = cv2.resize(base, (width, height), interpolation=interpolation)
+            resized = True
+        else:
+            resized = False
+        if pixel_format == base_format:
+            return base
+        if pixel_format not in ("bgr", "rgb", "gray"):
+            raise ValueError(f"Cannot provide a {pixel_format} view")
+        code = _CONVERSIONS[(base_format, pixel_format)]
+        # Swapping channels on our own resized copy needs no new buffer
+        if resized and base_format != "gray" and pixel_format != "gray":
+            return cv2.cvtColor(base, code, dst=base)
+        return cv2.cvtColor(base, code)
+
+    def _decoded(self, width, height):
+        """
+        Returns:
+            tuple: (image, pixel format) a view of the given size is built
+            from: the source or, for a compressed source, the smallest
+            reduced BGR decode at least that large. Each decode runs once.
+        """
+        if not self.encoded:
+            return self.source, self.pixel_format
+        factor, flag = 1, cv2.IMREAD_COLOR
+        for reduction, reduced_flag in REDUCED_DECODE_FLAGS:
+            if -(-self.width // reduction) >= width and -(-self.height // reduction) >= height:
+                factor, flag = reduction, reduced_flag
+                break
+        key = ("decoded", factor)
+        with self._lock:
+            decoded = self._views.get(key)
+        if decoded is None:
+            decoded = cv2.imdecode(self.source, flag)
+            if decoded is None:
+                raise ValueError("Could not decode the MJPEG frame")
+            with self._lock:
+                decoded = self._views.setdefault(key, decoded)
+        return decoded, "bgr"
+
+    def scale_to_full(self, level_width, level_height):
+        """
+        Returns:
+            tuple: (scale_x, scale_y) that map coordinates on a level of the
+            given size back to full resolution
+        """
+        return self.width / level_width, self.height / level_height
@@ -0,0 +1,66 @@
+import cv2
+import numpy as np
+
+
+class FrameQuality:
+    """
+    Quality of one frame as scored by FrameQualityScorer.
+    """
+
+    __slots__ = ("sharpness", "clipped", "score", "usable")
+
+    def __init__(self, sharpness, clipped, score, usable):
+        # Variance of the Laplacian of the grey level, low for blurred frames
+        self.sharpness = sharpness
+        # Fraction of pixels crushed to black or blown out to white
+        self.clipped = clipped
+        # 0 (unusable) to 1 (sharp and well exposed)
+        self.score = score
+        self.usable = usable
+
+    def __repr__(self):
+        return f"FrameQuality(sharpness={self.sharpness:.1f}, clipped={self.clipped:.2f}, score={self.score:.2f})"
+
+
+class FrameQualityScorer:
+    """
+    Cheap blur and exposure check on the low resolution grey level of a
+    frame's pyramid. Motion blur shows up as a low variance of the
+    Laplacian, sun glare and dark frames as a large share of the histogram
+    piled up at either end.
+    """
+
+    def __init__(self, min_sharpness=30.0, max_clipped=0.4, level_width=320, clip_margin=4):
+        """
+        Args:
+            min_sharpness (float): Laplacian variance under which a frame is blurred
+            max_clipped (float): Fraction of clipped pixels above which a frame
+                is over or under exposed
+            level_width (int): Width of the pyramid level the score runs on
+            clip_margin (int): Grey levels at each end of the histogram that count as clipped
+        """
+        self.min_sharpness = min_sharpness
+        self.max_clipped = max_clipped
+        self.level_width = level_width
+        self.clip_margin = clip_margin
+
+    def score(self, pyramid):
+        """
+        Args:
+            pyramid (FramePyramid): Pyramid of the frame to score
+
+        Returns:
+            FrameQuality: The frame's sharpness, clipping and overall score
+        """
+        grey = pyramid.grey(self.level_width)
+        sharpness = float(cv2.Laplacian(grey, cv2.CV_32F).var())
+
+        histogram = np.bincount(grey.ravel(), minlength=256)
+        clipped = float(
+            (histogram[:self.clip_margin].sum() + histogram[256 - self.clip_margin:].sum()) / grey.size
+        )
+
+        sharp_score = min(sharpness / (2 * self.min_sharpness), 1.0)
+        exposure_score = max(1.0 - clipped / (2 * self.max_clipped), 0.0)
+        usable = sharpness >= self.min_sharpness and clipped <= self.max_clipped
+        return FrameQuality(sharpness, clipped, sharp_score * exposure_score, usable)
@@ -1,120 +1,912 @@
-from jetson_inference import detectNet
-from jetson_utils import (cudaToNumpy, cudaFromNumpy)
-from .scanner_detection import ScannerDetection
-from PIL import Image
-import tempfile
-import os
-import os.path
+from .scanner_detection import DetectionSet
+from .tile_planner import plan_tiles
+from .nms import ios_matrix, non_max_suppression
+from .frame_pyramid import FramePyramid
+from .detector_backends import create_backend, cuda_image_to_numpy
+from .change_detector import TileChangeDetector
+from .tile_scheduler import TileScheduler
 from frontend.shared_labels_controller import shared_labels
 import numpy as np
-import cv2
+import time
 
 
 class ImageProcessor:
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, backend="auto", threads=None, max_batch=8, precision="fp32"):
+        """
+        Args:
+            model_path (str): Path to the SSD-Mobilenet ONNX model
+            backend (str): Detector backend, see detector_backends.create_backend
+            threads (int, optional): CPU intra-op threads for the CPU backend
+            max_batch (int): Largest batched input for the CPU backend
+            precision (str): "fp32", "fp16" or "int8" weights for the CPU backend
+        """
         self.model_path = model_path
-        self.net = None
+        # IoU above which two boxes of one class are the same detection
+        self.nms_threshold = 0.45
+        # Overlap (intersection over the smaller box) above which boxes cut
+        # by a seam between neighbouring tiles are merged into one detection
+        self.tile_nms_threshold = 0.5
 
         labels_and_colors = shared_labels.get_init_labels()
-        labels = [label for label, _ in labels_and_colors]
+        # Class id -> label table, the class id is the index into the labels file
+        self.labels = [label for label, _ in labels_and_colors]
         colors = [color for _, color in labels_and_colors]
-
-        temp_label_file = tempfile.NamedTemporaryFile(delete=False)
-        temp_color_file = tempfile.NamedTemporaryFile(delete=False)
+        self._threshold_lut = None
+        self._default_threshold = None
+        # Selected-targets mode, see set_target_filter
+        self.targets_only = False
+        self.always_on_labels = set()
+        self.backend = None
+        self.rebuild_thresholds()
+        shared_labels.add_observer(self.on_threshold_change)
+        shared_labels.add_selection_observer(self.on_selection_change)
 
         try:
-            with open(temp_label_file.name, 'w') as f:
-                f.write('\n'.join(labels))
-            with open(temp_color_file.name, 'w') as f:
-                f.write('\n'.join([f"{r} {g} {b}" for (r, g, b) in colors]))
-
-            if self.model_path and os.path.exists(self.model_path):
-                print(f"Loading custom model from: {self.model_path}")
-                self.net = detectNet(
-                    model=self.model_path,
-                    labels=temp_label_file.name,
-                    colors=temp_color_file.name,
-                    input_blob="input_0",
-                    output_cvg="scores",
-                    output_bbox="boxes",
-                    threshold=0.01
-                )
-            else:
-                print("Using built-in ssd-mobilenet-v2 model")
-                self.net = detectNet(
-                    "ssd-mobilenet-v2",
-                    labels=temp_label_file.name,
-                    colors=temp_color_file.name,
-                    threshold=0.01
-                )
-
-            if not hasattr(self.net, 'SetThreshold'):
-                print("Warning: detectNet doesn't have SetThreshold method")
-
+            self.backend = create_backend(
+                backend, self.model_path, self.labels, colors,
+                threads=threads, max_batch=max_batch, precision=precision,
+            )
         except Exception as e:
             print(f"Error loading model: {e}")
             raise
-        finally:
-            os.unlink(temp_label_file.name)
-            os.unlink(temp_color_file.name)
+        print(f"Using {self.backend.name} detector backend")
+        self.rebuild_thresholds()
+
+        # Network input resolution, whole-frame detection runs on this pyramid level
+        self.input_size = self.backend.input_size
+        # (width, height) of the pyramid level tiles are cut from, None for
+        # capture resolution. Set by the auto tuner, see set_detection_size
+        self.detection_size = None
+
+        # Change gating of the tiled path, see set_change_gating
+        self.change_gating = False
+        self.change_threshold = 6.0
+        self.refresh_interval = 10
+        self._change_detectors = {}
+        # Unfiltered rows of the last inference per (camera_id, tile_id),
+        # reused for tiles the change detector skips
+        self._tile_cache = {}
+        # camera_id -> (tiles_run, tiles_skipped) for the last detect_batch call
+        self.last_tile_stats = {}
+
+        # Rotating tile scheduling, see set_tile_budget
+        self.tile_budget = 0
+        self.priority_fraction = 0.5
+        self.hot_frames = 5
+        self._schedulers = {}
+        # Per camera budget after stalled cameras gave theirs away, see share_tile_budget
+        self._camera_tile_budget = 0
+
+        # camera_id -> CameraMask and HorizonMaskLearner, see set_camera_mask
+        self._masks = {}
+        self._mask_learners = {}
+        self.on_mask_learned = None
+
+        # Two-stage cascade, see set_cascade
+        self.cascade = False
+        self.proposal_threshold = 0.1
+        self.crop_padding = 0.5
+        self.max_crops = 8
+        # Per-stage timings and crop counts of the last cascade pass
+        self.last_cascade_stats = None
+
+        # Multi-scale detection, see set_multi_scale
+        self.multi_scale = False
+        self.scale_count = 3
+        self.fine_grid = (3, 3)
+        self.min_object = 12
+        self.size_limits = {}
+        self._min_size = np.zeros(len(self.labels), dtype=np.float32)
+        self._max_size = np.full(len(self.labels), np.inf, dtype=np.float32)
+        self._scale_plans = {}
+
+    def set_change_gating(self, enabled, threshold=6.0, refresh_interval=10):
+        """
+        Skip inference on tiles that have not changed since they were last
+        run, forcing every tile through at least every `refresh_interval`
+        frames. Skipped tiles reuse their previous detections.
+
+        Args:
+            enabled (bool): Turn change gating on or off
+            threshold (float): Mean grey level difference that counts as change
+            refresh_interval (int): Frames after which a static tile is rerun
+        """
+        self.change_gating = enabled
+        self.change_threshold = threshold
+        self.refresh_interval = refresh_interval
+        self._change_detectors = {}
+        self._tile_cache = {}
+
+    def set_target_filter(self, enabled, always_on=()):
+        """
+        Only pass the operator's selected targets, plus an always-on set,
+        through the pipeline. Other classes are dropped by the backend right
+        after decoding, so filtering, tracking, overlays and save scoring
+        only ever see the classes the crew cares about. While no target is
+        selected every class passes.
+
+        Args:
+            enabled (bool): Turn selected-targets mode on or off
+            always_on (iterable of str): Labels that pass whatever is selected
+        """
+        self.targets_only = enabled
+        self.always_on_labels = set(always_on)
+        self.rebuild_thresholds()
+
+    def active_labels(self):
+        """
+        Returns:
+            set: Labels that pass the target filter, None when every label does
+        """
+        selected = shared_labels.get_selected_labels()
+        if not self.targets_only or not selected:
+            return None
+        return set(selected) | self.always_on_labels
+
+    def rebuild_thresholds(self):
+        """
+        Precompute the per-class threshold array indexed by class id, with
+        classes outside the target filter set to infinity. A new array is
+        swapped in whole so the detection thread never sees a half-updated
+        table; the backend gets the matching class mask.
+        """
+        active = self.active_labels()
+        lut = np.array([shared_labels.get_threshold(label) for label in self.labels], dtype=np.float32)
+        if active is None:
+            self._default_threshold = shared_labels.get_threshold(None)
+            class_mask = None
+        else:
+            class_mask = np.array([label in active for label in self.labels], dtype=bool)
+            lut[~class_mask] = np.inf
+            self._default_threshold = np.inf
+        self._threshold_lut = lut
+        if self.backend is not None:
+            self.backend.class_mask = class_mask
+
+    def on_threshold_change(self, _label, _threshold):
+        """
+        Observer for SharedLabels.set_threshold. Every threshold is read
+        again, so the changed label and value are not needed.
+        """
+        self.rebuild_thresholds()
+
+    def on_selection_change(self, _labels):
+        """
+        Observer for SharedLabels.set_selected_labels. The selection is
+        read back from shared_labels when the thresholds are rebuilt.
+        """
+        if self.targets_only:
+            self.rebuild_thresholds()
 
     def filter_detections(self, detections):
-        filtered = []
-        for detection in detections:
-            label = self.net.GetClassDesc(detection.ClassID)
-            threshold = shared_labels.get_threshold(label)
-            if detection.Confidence >= threshold:
-                filtered.append(detection)
-                # print(f"Accepted detection: {label} ({detection.Confidence:.2f} >= {threshold:.2f})")
-            else:
-                # print(f"Rejected detection: {label} ({detection.Confidence:.2f} < {threshold:.2f})")
-                pass
-        return filtered
+        """
+        Drop detections under their category threshold with one array
+        comparison over every row, whatever camera or tile it came from.
+
+        Args:
+            detections (np.ndarray): (K, 6+) rows starting with class_id, confidence
+
+        Returns:
+            np.ndarray: The rows that pass
+        """
+        lut = self._threshold_lut
+        class_ids = detections[:, 0].astype(np.intp)
+        in_table = (class_ids >= 0) & (class_ids < len(lut))
+        thresholds = np.where(
+            in_table,
+            lut[np.clip(class_ids, 0, len(lut) - 1)],
+            self._default_threshold,
+        )
+        return detections[detections[:, 1] >= thresholds]
+
+    def set_detection_size(self, size):
+        """
+        Cut segmentation tiles from a downscaled pyramid level instead of the
+        full resolution frame. Levels keep the frame's aspect ratio, only the
+        width is used, and frames narrower than `size` stay at full resolution.
 
-    def detect_and_collect(self, image_segment):
-        detections = self.net.Detect(image_segment, overlay="none")
-        detections = self.filter_detections(detections)
-        return detections
+        Args:
+            size (tuple): (width, height) of the detection level, None for full resolution
+        """
+        self.detection_size = tuple(size) if size else None
+
+    def set_camera_mask(self, camera_id, mask):
+        """
+        Args:
+            camera_id (int): Index of the camera in camera_feeds
+            mask (CameraMask): Static mask of the camera, None to remove it
+        """
+        if mask is None:
+            self._masks.pop(camera_id, None)
+        else:
+            self._masks[camera_id] = mask
+        # Scheduler state and cached rows may cover tiles that are now masked
+        self._schedulers.pop(camera_id, None)
+        self._tile_cache = {k: v for k, v in self._tile_cache.items() if k[0] != camera_id}
+
+    def reset_camera(self, camera_id):
+        """
+        Forget the change gate, tile schedule and cached tile rows of one
+        camera, e.g. when its capture resolution changed.
+
+        Args:
+            camera_id (int): Index of the camera in camera_feeds
+        """
+        self._change_detectors.pop(camera_id, None)
+        self._schedulers.pop(camera_id, None)
+        self._tile_cache = {k: v for k, v in self._tile_cache.items() if k[0] != camera_id}
+
+    def learn_horizon_mask(self, camera_id, learner):
+        """
+        Learn a sky mask for a camera from its next frames. The learned
+        CameraMask is applied and handed to on_mask_learned(camera_id, mask).
+
+        Args:
+            camera_id (int): Index of the camera in camera_feeds
+            learner (HorizonMaskLearner): Learner fed with the camera's frames
+        """
+        self._mask_learners[camera_id] = learner
+
+    def _update_mask_learners(self, frames):
+        for camera_id in list(self._mask_learners):
+            if camera_id not in frames:
+                continue
+            mask = self._mask_learners[camera_id].update(frames[camera_id])
+            if mask is None:
+                continue
+            del self._mask_learners[camera_id]
+            print(f"[ImageProcessor] Learned horizon mask for camera {camera_id + 1}, "
+                  f"{mask.mask.mean():.0%} masked")
+            self.set_camera_mask(camera_id, mask)
+            if self.on_mask_learned:
+                self.on_mask_learned(camera_id, mask)
+
+    def _drop_masked(self, rows, frames):
+        """
+        Drop (K, 8) rows whose box centre falls in their camera's mask.
+        """
+        if not self._masks or not len(rows):
+            return rows
+        keep = np.ones(len(rows), dtype=bool)
+        for camera_id, mask in self._masks.items():
+            if camera_id not in frames:
+                continue
+            on_camera = np.flatnonzero(rows[:, 6] == camera_id)
+            if len(on_camera):
+                pyramid = frames[camera_id]
+                keep[on_camera] = ~mask.masked_centres(rows[on_camera, 2:6], pyramid.width, pyramid.height)
+        return rows[keep]
+
+    def set_cascade(self, enabled, proposal_threshold=0.1, padding=0.5, max_crops=8):
+        """
+        Replace whole-frame and tiled detection with a two-stage cascade.
+        The model first runs on the model input level of the whole frame
+        with a low threshold to propose regions; only those regions, padded,
+        are run again at full resolution and filtered with the real
+        per-class thresholds.
+
+        Args:
+            enabled (bool): Turn the cascade on or off
+            proposal_threshold (float): Confidence a first stage detection
+                needs, whatever its class, to become a proposal
+            padding (float): Context added around each proposal, as a
+                fraction of its width and height
+            max_crops (int): Most second stage crops per camera, highest
+                proposal confidence first
+        """
+        self.cascade = enabled
+        self.proposal_threshold = proposal_threshold
+        self.crop_padding = padding
+        self.max_crops = max(1, int(max_crops))
+
+    def set_multi_scale(self, enabled, scales=3, fine_grid=(3, 3), size_limits=None, min_object=12):
+        """
+        Search every frame at several scales of its pyramid: the whole frame
+        at the model input size, optionally a coarse grid of the
+        intermediate level, and the segmentation grid at the detection level
+        as the finest scale. Each scale only keeps the object sizes it sees
+        well, each class is only searched at the scales its size range
+        reaches, and a scale no active class needs is skipped. Duplicates
+        across scales are merged preferring the scale that fits the object.
+
+        Args:
+            enabled (bool): Turn multi-scale detection on or off
+            scales (int): 2 (whole frame and grid) or 3 (with the coarse grid between)
+            fine_grid (tuple): (rows, cols) of the finest scale while segmentation is off
+            size_limits (dict): label -> (min, max) longer box side in capture
+                pixels. Labels not listed are searched at every scale.
+            min_object (int): Smallest object, in network input pixels, the
+                model detects reliably. Sets where each scale's range starts.
+        """
+        self.multi_scale = enabled
+        self.scale_count = min(3, max(2, int(scales)))
+        self.fine_grid = tuple(fine_grid)
+        self.min_object = min_object
+        self.size_limits = {label: (float(low), float(high)) for label, (low, high) in (size_limits or {}).items()}
+        self._min_size = np.zeros(len(self.labels), dtype=np.float32)
+        self._max_size = np.full(len(self.labels), np.inf, dtype=np.float32)
+        for class_id, label in enumerate(self.labels):
+            if label in self.size_limits:
+                self._min_size[class_id], self._max_size[class_id] = self.size_limits[label]
+        self._scale_plans = {}
+
+    def set_tile_budget(self, budget, priority_fraction=0.5, hot_frames=5):
+        """
+        Limit how many tiles of each camera run per frame. Tiles are visited
+        by a TileScheduler that rotates through the grid, revisiting tiles
+        with recent detections or changes more often.
+
+        Args:
+            budget (int): Tiles per camera per frame, 0 runs every tile
+            priority_fraction (float): Share of the budget for hot and changed tiles
+            hot_frames (int): Frames a tile stays prioritised after a detection
+        """
+        self.tile_budget = max(0, int(budget))
+        self._camera_tile_budget = self.tile_budget
+        self.priority_fraction = priority_fraction
+        self.hot_frames = hot_frames
+        self._schedulers = {}
+        self._tile_cache = {}
+
+    def share_tile_budget(self, live_cameras, num_cameras):
+        """
+        Hand the tile budget of stalled cameras to the live ones, so the
+        total number of tiles per frame stays the same.
+
+        Args:
+            live_cameras (int): Cameras currently delivering new frames
+            num_cameras (int): Number of camera feeds
+        """
+        if not self.tile_budget:
+            return
+        budget = self.tile_budget * num_cameras // max(live_cameras, 1)
+        if budget == self._camera_tile_budget:
+            return
+        print(f"[ImageProcessor] {live_cameras}/{num_cameras} cameras live, tile budget per camera -> {budget}")
+        self._camera_tile_budget = budget
+        for scheduler in list(self._schedulers.values()):
+            scheduler.set_budget(budget)
+
+    def tile_revisit_interval(self, grid_size, stride=1):
+        """
+        Args:
+            grid_size (tuple): (rows, cols) of the grid, None for whole-frame
+            stride (int): Captured frames per inference frame, see
+                DetectionWorker.set_stride
+
+        Returns:
+            int: Worst-case number of captured frames between two visits of
+            any tile at the current per camera budget, i.e. the latency for
+            a target anywhere in the frame
+        """
+        if grid_size is None or not self.tile_budget:
+            return max(1, int(stride))
+        scheduler = TileScheduler(self._camera_tile_budget, self.priority_fraction, self.hot_frames)
+        return scheduler.revisit_interval(grid_size[0] * grid_size[1]) * max(1, int(stride))
 
     def detect(self, image, grid_size=None):
-        """Handle both numpy arrays and cudaImage inputs"""
+        """
+        Detect on a single image.
+
+        Args:
+            image (np.ndarray or cudaImage): BGR (or grayscale) numpy image,
+                or an rgb8/rgba8 jetson_utils cudaImage
+            grid_size (tuple, optional): (rows, cols) to tile the image into
+
+        Returns:
+            DetectionSet: Every detection above its threshold
+
+        Raises:
+            TypeError: For any other kind of image
+        """
         if isinstance(image, np.ndarray):
-            if len(image.shape) == 3:  # Color image
-                if image.shape[2] == 3:  # BGR format
-                    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-                image = cudaFromNumpy(image)
-            else:  # Grayscale
-                image = cudaFromNumpy(np.stack((image,) * 3, axis=-1))
+            pyramid = FramePyramid(image)
+        else:
+            pyramid = FramePyramid(cuda_image_to_numpy(image), pixel_format="rgb")
+        return self.detect_batch({0: pyramid}, grid_size)[0]
 
-        try:
-            height, width = image.height, image.width
-        except AttributeError:
-            print("Warning: Could not get image dimensions, using defaults")
-            height, width = 512, 512  # Default model input size
-
-        detections = []
-        if grid_size is not None:
-            grid_h, grid_w = height // grid_size[0], width // grid_size[1]
-            image_np = cudaToNumpy(image)
-            for i in range(grid_size[0]):
-                for j in range(grid_size[1]):
-                    segment = image_np[i * grid_h:(i + 1) * grid_h, j * grid_w:(j + 1) * grid_w]
-                    segment = cudaFromNumpy(segment)
-                    seg_detections = self.net.Detect(segment, overlay="none")
-                    for det in seg_detections:
-                        det.Left += j * grid_w
-                        det.Right += j * grid_w
-                        det.Top += i * grid_h
-                        det.Bottom += i * grid_h
-                    detections.extend(seg_detections)
+    def detect_batch(self, frames, grid_size=None, overlap=0.0):
+        """
+        Run detection over every camera frame, and every segmentation tile of
+        those frames, in a single pass. Whole-frame detection runs on the
+        model input level of each frame's pyramid, tiled detection on regions
+        of the detection level (full resolution unless set_detection_size
+        picked a smaller one). All jobs go to the backend together and
+        all raw detections are filtered together before being mapped back to
+        their camera and tile.
+
+        Args:
+            frames (dict): camera_id -> FramePyramid
+            grid_size (tuple, optional): (rows, cols) grid applied to every frame
+            overlap (float): Fraction of each tile shared with its neighbours
+
+        Returns:
+            dict: camera_id -> DetectionSet with boxes in full resolution
+            coordinates and the source tile of every row (-1 for whole-frame
+            detection).
+        """
+        self.last_tile_stats = {}
+        if self._mask_learners:
+            self._update_mask_learners(frames)
+        if self.cascade:
+            return self._detect_cascade(frames)
+        if self.multi_scale:
+            return self._detect_multi_scale(frames, tuple(grid_size or self.fine_grid), overlap)
+
+        jobs = []  # (image, roi) handed to the backend
+        job_info = []  # (camera_id, tile_id, x_offset, y_offset, scale_x, scale_y)
+        raw = []
+        for camera_id, pyramid in frames.items():
+            if grid_size is None:
+                self._whole_frame_job(camera_id, pyramid, jobs, job_info)
+            else:
+                self._tile_jobs(camera_id, pyramid, tuple(grid_size), overlap, jobs, job_info, raw)
+
+        outputs = self.backend.detect(jobs) if jobs else []
+        raw = np.concatenate(raw + self._stack_outputs(outputs, job_info))
+
+        kept = self._drop_masked(self.filter_detections(raw), frames)
+
+        for camera_id, scheduler in self._schedulers.items():
+            if camera_id in frames:
+                scheduler.mark_hot(kept[kept[:, 6] == camera_id][:, 7])
+
+        results = {}
+        for camera_id in frames:
+            rows = kept[kept[:, 6] == camera_id]
+            if grid_size is not None:
+                pyramid = frames[camera_id]
+                tiles = plan_tiles(pyramid.height, pyramid.width, tuple(grid_size), overlap)
+                rows = self._merge_tile_duplicates(rows, tiles)
+            results[camera_id] = DetectionSet.from_columns(
+                self.labels, rows[:, 0], rows[:, 1], rows[:, 2:6],
+                camera_id, rows[:, 7], frames[camera_id].timestamp,
+            )
+        return results
+
+    def _whole_frame_job(self, camera_id, pyramid, jobs, job_info):
+        scale_x, scale_y = pyramid.scale_to_full(*self.input_size)
+        jobs.append((pyramid.resized(*self.input_size), None))
+        job_info.append((camera_id, -1, 0, 0, scale_x, scale_y))
+
+    def _tile_jobs(self, camera_id, pyramid, grid_size, overlap, jobs, job_info, raw):
+        """
+        Queue the tiles of one camera that are due for inference and collect
+        the cached rows of the tiles that are not.
+        """
+        tiles = plan_tiles(pyramid.height, pyramid.width, grid_size, overlap)
+        active = self._active_tiles(camera_id, pyramid, tiles)
+        level, scale_x, scale_y = self._detection_level(pyramid)
+        for tile, run in zip(tiles, active):
+            tile_id, left, top, right, bottom = tile
+            if run:
+                jobs.append((level, self._level_roi(tile, scale_x, scale_y)))
+                job_info.append((camera_id, tile_id, left, top, scale_x, scale_y))
+            elif (camera_id, tile_id) in self._tile_cache:
+                raw.append(self._tile_cache[(camera_id, tile_id)])
+        self.last_tile_stats[camera_id] = (int(active.sum()), int(len(tiles) - active.sum()))
+
+    def _stack_outputs(self, outputs, job_info):
+        """
+        Map raw backend outputs to full resolution (K, 8) rows of class_id,
+        confidence, left, top, right, bottom, camera_id, tile_id, caching
+        the rows of every tile for change gating and the tile budget.
+
+        Returns:
+            list of np.ndarray: One array per job, plus an empty one so the
+            list can always be concatenated
+        """
+        stacked = [np.empty((0, 8), dtype=np.float32)]
+        for output, (camera_id, tile_id, x_offset, y_offset, scale_x, scale_y) in zip(outputs, job_info):
+            rows = np.empty((len(output), 8), dtype=np.float32)
+            rows[:, :2] = output[:, :2]
+            rows[:, 2:6] = output[:, 2:6] * (scale_x, scale_y, scale_x, scale_y) + (x_offset, y_offset, x_offset, y_offset)
+            rows[:, 6] = camera_id
+            rows[:, 7] = tile_id
+            if tile_id >= 0 and (self.change_gating or self.tile_budget):
+                self._tile_cache[(camera_id, tile_id)] = rows
+            stacked.append(rows)
+        return stacked
+
+    def _detect_cascade(self, frames):
+        """
+        Two-stage detection, see set_cascade. Both stages are batched over
+        every camera. Per-stage timings and crop counts are left in
+        last_cascade_stats.
+
+        Returns:
+            dict: camera_id -> DetectionSet, as detect_batch
+        """
+        started = time.perf_counter()
+        jobs, job_info = [], []
+        for camera_id, pyramid in frames.items():
+            scale_x, scale_y = pyramid.scale_to_full(*self.input_size)
+            jobs.append((pyramid.resized(*self.input_size), None))
+            job_info.append((camera_id, -1, 0, 0, scale_x, scale_y))
+        proposals = np.concatenate(self._stack_outputs(self.backend.detect(jobs), job_info))
+        proposals = self._drop_masked(proposals[proposals[:, 1] >= self.proposal_threshold], frames)
+        proposal_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        jobs, job_info = [], []
+        crop_counts = {}
+        for camera_id, pyramid in frames.items():
+            crops = self._proposal_crops(proposals[proposals[:, 6] == camera_id], pyramid)
+            crop_counts[camera_id] = len(crops)
+            full = pyramid.full() if crops else None
+            for left, top, right, bottom in crops:
+                jobs.append((full, (left, top, right, bottom)))
+                job_info.append((camera_id, -1, left, top, 1.0, 1.0))
+        outputs = self.backend.detect(jobs) if jobs else []
+        kept = self._drop_masked(
+            self.filter_detections(np.concatenate(self._stack_outputs(outputs, job_info))), frames
+        )
+
+        results = {}
+        for camera_id in frames:
+            # Neighbouring crops can overlap, report what they both saw once
+            rows = self._merge_tile_duplicates(kept[kept[:, 6] == camera_id])
+            results[camera_id] = DetectionSet.from_columns(
+                self.labels, rows[:, 0], rows[:, 1], rows[:, 2:6],
+                camera_id, rows[:, 7], frames[camera_id].timestamp,
+            )
+        refine_time = time.perf_counter() - started
+
+        self.last_cascade_stats = {
+            "proposal_ms": proposal_time * 1000,
+            "refine_ms": refine_time * 1000,
+            "crops": crop_counts,
+        }
+        return results
+
+    def _detect_multi_scale(self, frames, fine_grid, overlap):
+        """
+        Multi-scale detection, see set_multi_scale. Every scale of every
+        camera goes to the backend in one batch. Only the finest scale uses
+        change gating, the tile budget and the tile cache.
+
+        Returns:
+            dict: camera_id -> DetectionSet, as detect_batch. Rows found at
+            the coarser scales have tile id -1.
+        """
+        active = self.active_labels()
+        searched_classes = np.ones(len(self.labels), dtype=bool) if active is None else \
+            np.array([label in active for label in self.labels], dtype=bool)
+
+        jobs, job_info, job_scales = [], [], []
+        cached, cached_scales = [], []
+        plans = {}
+        for camera_id, pyramid in frames.items():
+            plan = self._scale_plan(pyramid, fine_grid, overlap)
+            plans[camera_id] = plan
+            for scale, (grid, low, high, _) in enumerate(plan):
+                reachable = (self._max_size >= low) & (self._min_size <= high) & searched_classes
+                if not reachable.any():
+                    continue
+                queued, queued_cached = len(jobs), len(cached)
+                if grid is None:
+                    self._whole_frame_job(camera_id, pyramid, jobs, job_info)
+                elif scale == len(plan) - 1:
+                    self._tile_jobs(camera_id, pyramid, grid, overlap, jobs, job_info, cached)
+                else:
+                    self._coarse_grid_jobs(camera_id, pyramid, grid, overlap, jobs, job_info)
+                job_scales.extend([scale] * (len(jobs) - queued))
+                cached_scales.extend([scale] * (len(cached) - queued_cached))
+
+        outputs = self.backend.detect(jobs) if jobs else []
+        # The first stacked array is the empty placeholder
+        pieces = self._stack_outputs(outputs, job_info) + cached
+        piece_scales = [0] + job_scales + cached_scales
+        raw = np.concatenate(pieces)
+        scales = np.concatenate([np.full(len(rows), scale, dtype=np.float32) for rows, scale in zip(pieces, piece_scales)])
+        # Carry the scale as a ninth column through filtering and masking
+        raw = np.concatenate([raw, scales[:, None]], axis=1)
+        kept = self._drop_masked(self.filter_detections(raw), frames)
+
+        for camera_id, scheduler in self._schedulers.items():
+            if camera_id in frames:
+                scheduler.mark_hot(kept[kept[:, 6] == camera_id][:, 7])
+
+        results = {}
+        for camera_id in frames:
+            pyramid = frames[camera_id]
+            tiles = plan_tiles(pyramid.height, pyramid.width, fine_grid, overlap)
+            rows = self._merge_scales(kept[kept[:, 6] == camera_id], plans[camera_id], tiles)
+            results[camera_id] = DetectionSet.from_columns(
+                self.labels, rows[:, 0], rows[:, 1], rows[:, 2:6],
+                camera_id, rows[:, 7], frames[camera_id].timestamp,
+            )
+        return results
+
+    def _scale_plan(self, pyramid, fine_grid, overlap):
+        """
+        Returns:
+            list of tuple: (grid, min size, max size, factor) per scale,
+            coarsest first. grid is None for the whole frame, factor is the
+            capture pixels per network input pixel. The sizes are the longer
+            box side in capture pixels the scale sees well: from min_object
+            up to the full network input. The finest scale has no lower and
+            the coarsest no upper limit, nothing else covers those sizes.
+        """
+        key = (pyramid.size, fine_grid, overlap, self.scale_count)
+        plan = self._scale_plans.get(key)
+        if plan is not None:
+            return plan
+
+        grids = [None, fine_grid]
+        coarse = ((fine_grid[0] + 1) // 2, (fine_grid[1] + 1) // 2)
+        if self.scale_count == 3 and coarse != (1, 1) and coarse != fine_grid:
+            grids.insert(1, coarse)
+        if fine_grid == (1, 1):
+            grids = [None]
+
+        plan = []
+        for grid in grids:
+            if grid is None:
+                region_width, region_height = pyramid.width, pyramid.height
+            else:
+                tiles = plan_tiles(pyramid.height, pyramid.width, grid, overlap)
+                region_width = max(t[3] - t[1] for t in tiles)
+                region_height = max(t[4] - t[2] for t in tiles)
+            # Capture pixels per network input pixel, along the more squeezed axis
+            factor = max(region_width / self.input_size[0], region_height / self.input_size[1])
+            plan.append([grid, self.min_object * factor, min(self.input_size) * factor, factor])
+        plan[0][2] = np.inf
+        plan[-1][1] = 0.0
+        plan = [tuple(scale) for scale in plan]
+        self._scale_plans[key] = plan
+        return plan
+
+    def _coarse_grid_jobs(self, camera_id, pyramid, grid, overlap, jobs, job_info):
+        """
+        Queue every tile of an intermediate scale, cut from the smallest
+        pyramid level that still gives the network its full input size.
+        """
+        tiles = plan_tiles(pyramid.height, pyramid.width, grid, overlap)
+        width = min(pyramid.width, int(np.ceil(pyramid.width * self.input_size[0] / min(t[3] - t[1] for t in tiles))))
+        height = max(1, round(width * pyramid.height / pyramid.width))
+        if width >= pyramid.width:
+            level, scale_x, scale_y = pyramid.full(), 1.0, 1.0
         else:
-            detections = self.net.Detect(image, overlay="none")
+            level = pyramid.resized(width, height)
+            scale_x, scale_y = pyramid.scale_to_full(width, height)
+        for tile in tiles:
+            _, left, top, _, _ = tile
+            jobs.append((level, self._level_roi(tile, scale_x, scale_y)))
+            job_info.append((camera_id, -1, left, top, scale_x, scale_y))
+
+    def _merge_scales(self, rows, plan, tiles):
+        """
+        Scale-aware NMS over the (K, 9) rows of one camera. Rows outside the
+        size range of their scale or of their class are dropped, duplicates
+        and the seams of the fine grid (`tiles`) are merged within each
+        scale, then duplicates across scales are suppressed ranking each row
+        by its confidence times how well its size fits the scale it was
+        found at.
+
+        Returns:
+            np.ndarray: (K, 8) rows
+        """
+        if not len(rows):
+            return rows[:, :8]
+        sizes = np.maximum(rows[:, 4] - rows[:, 2], rows[:, 5] - rows[:, 3])
+        scales = rows[:, 8].astype(np.intp)
+        class_ids = np.clip(rows[:, 0].astype(np.intp), 0, len(self.labels) - 1)
+        low = np.array([scale[1] for scale in plan], dtype=np.float32)[scales]
+        high = np.array([scale[2] for scale in plan], dtype=np.float32)[scales]
+        fits = (sizes >= low) & (sizes <= high) & (sizes >= self._min_size[class_ids]) & (sizes <= self._max_size[class_ids])
+        rows = rows[fits]
+
+        per_scale = [self._merge_tile_duplicates(rows[rows[:, 8] == scale], tiles) for scale in range(len(plan))]
+        rows = np.concatenate(per_scale)
+        if len(per_scale) == 1 or len(rows) < 2:
+            return rows[:, :8]
+
+        # Log distance of each size from the middle of its scale's nominal
+        # range, 1 at the middle down to 0.5 at the edges and beyond
+        factors = np.array([scale[3] for scale in plan], dtype=np.float32)[rows[:, 8].astype(np.intp)]
+        centre = np.sqrt(self.min_object * min(self.input_size)) * factors
+        half_width = 0.5 * np.log(min(self.input_size) / self.min_object)
+        sizes = np.maximum(rows[:, 4] - rows[:, 2], rows[:, 5] - rows[:, 3])
+        fit = 1.0 - 0.5 * np.minimum(1.0, np.abs(np.log(np.maximum(sizes, 1.0) / centre)) / half_width)
+        keep, _ = non_max_suppression(
+            rows[:, 2:6], rows[:, 1] * fit, rows[:, 0], self.tile_nms_threshold, metric="ios"
+        )
+        return rows[keep, :8]
+
+    def _proposal_crops(self, proposals, pyramid):
+        """
+        Turn first stage proposals into padded full resolution crops. Crops
+        are at least the network input size, so small targets are seen at
+        native resolution rather than upscaled, and crops that mostly
+        overlap are merged into one.
+
+        Args:
+            proposals (np.ndarray): (K, 8) proposal rows of one camera
+            pyramid (FramePyramid): Pyramid of that camera's frame
+
+        Returns:
+            list of tuple: (left, top, right, bottom) crops, at most max_crops
+        """
+        proposals = proposals[np.argsort(-proposals[:, 1])][:self.max_crops]
+        min_width = min(self.input_size[0], pyramid.width)
+        min_height = min(self.input_size[1], pyramid.height)
+        crops = []
+        for left, top, right, bottom in proposals[:, 2:6]:
+            pad_x = max((right - left) * self.crop_padding, (min_width - (right - left)) / 2)
+            pad_y = max((bottom - top) * self.crop_padding, (min_height - (bottom - top)) / 2)
+            crop = [left - pad_x, top - pad_y, right + pad_x, bottom + pad_y]
+            # Shift crops back inside the frame rather than shrinking them
+            for lo, hi, size in ((0, 2, pyramid.width), (1, 3, pyramid.height)):
+                shift = max(0.0, -crop[lo]) - max(0.0, crop[hi] - size)
+                crop[lo] = max(0.0, crop[lo] + shift)
+                crop[hi] = min(float(size), crop[hi] + shift)
+            crops.append(crop)
+
+        merged = True
+        while merged and len(crops) > 1:
+            merged = False
+            for i in range(len(crops)):
+                for j in range(i + 1, len(crops)):
+                    a, b = crops[i], crops[j]
+                    inter = max(0.0, min(a[2], b[2]) - max(a[0], b[0])) * max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+                    smaller = min((a[2] - a[0]) * (a[3] - a[1]), (b[2] - b[0]) * (b[3] - b[1]))
+                    if inter > 0.5 * smaller:
+                        crops[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                        del crops[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+        return [tuple(int(round(v)) for v in crop) for crop in crops]
+
+    def _detection_level(self, pyramid):
+        """
+        Returns:
+            tuple: (level, scale_x, scale_y), the RGB image tiles are cut from
+            and the scales mapping its coordinates back to full resolution
+        """
+        if self.detection_size is None or self.detection_size[0] >= pyramid.width:
+            return pyramid.full(), 1.0, 1.0
+        width = int(self.detection_size[0])
+        height = max(1, round(width * pyramid.height / pyramid.width))
+        return (pyramid.resized(width, height), *pyramid.scale_to_full(width, height))
+
+    @staticmethod
+    def _level_roi(tile, scale_x, scale_y):
+        """
+        Map a full resolution tile onto the detection level.
+        """
+        _, left, top, right, bottom = tile
+        if scale_x == 1.0 and scale_y == 1.0:
+            return left, top, right, bottom
+        left, top = int(left / scale_x), int(top / scale_y)
+        right = max(int(round(right / scale_x)), left + 1)
+        bottom = max(int(round(bottom / scale_y)), top + 1)
+        return left, top, right, bottom
+
+    def _active_tiles(self, camera_id, pyramid, tiles):
+        """
+        Returns:
+            np.ndarray: Boolean mask of the tiles to run inference on
+        """
+        masked = None
+        if camera_id in self._masks:
+            masked = self._masks[camera_id].masked_tiles(tiles, pyramid.width, pyramid.height)
+
+        if not self.change_gating and not self.tile_budget:
+            return np.ones(len(tiles), dtype=bool) if masked is None else ~masked
+
+        changed = None
+        detector = None
+        if self.change_gating:
+            detector = self._change_detectors.get(camera_id)
+            if detector is None:
+                detector = TileChangeDetector(self.change_threshold, self.refresh_interval)
+                self._change_detectors[camera_id] = detector
+            if tiles is not detector.tiles:
+                # New tile plan, cached rows belong to the old tiles
+                self._tile_cache = {k: v for k, v in self._tile_cache.items() if k[0] != camera_id}
+            changed = detector.update(pyramid, tiles)
+
+        if not self.tile_budget:
+            active = changed if masked is None else changed & ~masked
+        else:
+            scheduler = self._schedulers.get(camera_id)
+            if scheduler is None:
+                scheduler = TileScheduler(self._camera_tile_budget, self.priority_fraction, self.hot_frames)
+                self._schedulers[camera_id] = scheduler
+            if tiles is not scheduler.tiles:
+                self._tile_cache = {k: v for k, v in self._tile_cache.items() if k[0] != camera_id}
+            active = scheduler.select(tiles, changed, masked)
+        if detector is not None:
+            # Only tiles that really run have been refreshed
+            detector.mark_run(active)
+        return active
+
+    def _merge_tile_duplicates(self, rows, tiles=None):
+        """
+        Duplicate suppression over the rows of one camera. With the tile
+        plan given, a target cut by a seam is first merged into one box, see
+        _merge_seams. Class-aware IoU NMS then reports a target seen by
+        several overlapping tiles or crops once. Boxes are never grown
+        otherwise, two nearby targets stay two detections.
+
+        Args:
+            rows (np.ndarray): (K, 8+) rows of one camera
+            tiles (tuple, optional): Tile plan the rows' tile ids refer to
+        """
+        if len(rows) < 2:
+            return rows
+        if tiles is not None:
+            rows = self._merge_seams(rows, tiles)
+        keep, _ = non_max_suppression(rows[:, 2:6], rows[:, 1], rows[:, 0], self.nms_threshold)
+        return rows[np.sort(keep)]
+
+    def _merge_seams(self, rows, tiles, tolerance=2.0):
+        """
+        Merge boxes of one target cut by a tile seam. Two boxes are the same
+        target when they are of one class, come from different tiles, one
+        lies mostly inside the other (tile_nms_threshold, intersection over
+        the smaller box), both reach into the region their tiles share and
+        at least one ends at an inner edge of its tile, where the seam cut
+        it. The better scoring box is grown to cover the other.
+        """
+        tile_ids = rows[:, 7].astype(np.intp)
+        from_tile = tile_ids >= 0
+        if from_tile.sum() < 2:
+            return rows
+        tile_boxes = np.zeros((len(tiles), 4), dtype=np.float32)
+        for tile_id, left, top, right, bottom in tiles:
+            tile_boxes[tile_id] = (left, top, right, bottom)
+        frame_right, frame_bottom = tile_boxes[:, 2].max(), tile_boxes[:, 3].max()
+
+        boxes = rows[:, 2:6]
+        own = tile_boxes[np.where(from_tile, tile_ids, 0)]
+        # Box ends at an edge of its tile that is not the frame border
+        cut = from_tile & (
+            ((boxes[:, 0] <= own[:, 0] + tolerance) & (own[:, 0] > 0))
+            | ((boxes[:, 1] <= own[:, 1] + tolerance) & (own[:, 1] > 0))
+            | ((boxes[:, 2] >= own[:, 2] - tolerance) & (own[:, 2] < frame_right))
+            | ((boxes[:, 3] >= own[:, 3] - tolerance) & (own[:, 3] < frame_bottom))
+        )
 
-        # Filter detections based on category thresholds
-        filtered_detections = self.filter_detections(detections)
+        # Region shared by the tiles of every pair, empty for tiles that do not overlap
+        shared = np.concatenate([
+            np.maximum(own[:, None, :2], own[None, :, :2]),
+            np.minimum(own[:, None, 2:], own[None, :, 2:]),
+        ], axis=2)
+        reaches = (
+            (np.minimum(boxes[:, None, 2], boxes[None, :, 2]) > shared[..., 0])
+            & (np.maximum(boxes[:, None, 0], boxes[None, :, 0]) < shared[..., 2])
+            & (np.minimum(boxes[:, None, 3], boxes[None, :, 3]) > shared[..., 1])
+            & (np.maximum(boxes[:, None, 1], boxes[None, :, 1]) < shared[..., 3])
+        )
+        same = (
+            from_tile[:, None] & from_tile[None, :]
+            & (tile_ids[:, None] != tile_ids[None, :])
+            & (rows[:, None, 0] == rows[None, :, 0])
+            & (cut[:, None] | cut[None, :])
+            & reaches
+            & (ios_matrix(boxes, boxes) > self.tile_nms_threshold)
+        )
+        if not same.any():
+            return rows
 
-        self.net.Overlay(image, filtered_detections, overlay="lines,labels,conf")
-        return [ScannerDetection(self.net.GetClassDesc(d.ClassID), d.Confidence) for d in filtered_detections]
+        merged = rows.copy()
+        absorbed = np.zeros(len(rows), dtype=bool)
+        keep = []
+        for i in np.argsort(-rows[:, 1], kind="stable"):
+            if absorbed[i]:
+                continue
+            group = np.flatnonzero(same[i] & ~absorbed)
+            if len(group):
+                merged[i, 2:4] = np.minimum(boxes[i, :2], boxes[group, :2].min(axis=0))
+                merged[i, 4:6] = np.maximum(boxes[i, 2:], boxes[group, 2:].max(axis=0))
+                absorbed[group] = True
+            absorbed[i] = True
+            keep.append(i)
+        return merged[np.sort(keep)]
 
     def get_label(self, label_id):
         """
@@ -124,4 +916,6 @@ class ImageProcessor:
         Returns:
             str: The label for the given ID.
         """
-        return self.net.GetClassDesc(label_id)
\ No newline at end of file
+        if 0 <= label_id < len(self.labels):
+            return self.labels[label_id]
+        return str(label_id)
@@ -2,6 +2,7 @@ import threading
 import queue
 import time
 import os
+from .frame_pyramid import FramePyramid
 from .scanner_image import ScannerImage
 from frontend.shared_labels_controller import shared_labels
 from frontend.application_current_settings_route import current_settings_route
@@ -42,9 +43,22 @@ class ImageSaver:
     def update_labels(self, labels):
         self.labels = labels
 
-    def add_image(self, image, detections, gps_coords):
-        image_copy = image.copy()
-        self.queue.put(ScannerImage(image_copy, detections, gps_coords))
+    def add_image(self, image, detections, gps_coords, quality=None):
+        """
+        Queue a frame for saving.
+
+        Args:
+            image (FramePyramid or np.ndarray): The frame. A pyramid is kept
+                as is and its full resolution frame decoded by the saver
+                thread, so frames that lose to a better one are never
+                decoded. Arrays and PIL images are copied.
+            detections (DetectionSet): Detections drawn on the saved frame
+            gps_coords (dict): GPS fix written to the frame and its EXIF data
+            quality (FrameQuality, optional): Quality used to rank the frame
+        """
+        if not isinstance(image, FramePyramid):
+            image = image.copy()
+        self.queue.put(ScannerImage(image, detections, gps_coords, quality))
 
     def run(self):
         while self.running:
@@ -80,6 +94,9 @@ class ImageSaver:
             priority = self.labels.get(detection.label, 1)
             multiplier = self.priority_mapping.get(priority, 1)
             score += detection.conf * multiplier
+        # Of a burst with similar detections keep the sharpest, best exposed frame
+        if scanner_image.quality is not None:
+            score *= 0.5 + 0.5 * scanner_image.quality.score
         return score
 
     def save_images(self, images):
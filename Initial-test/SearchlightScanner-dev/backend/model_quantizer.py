@@ -0,0 +1,232 @@
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from .detector_backends import precision_model_path, preprocess_images
+from .frame_pyramid import FramePyramid
+from .nms import iou_matrix
+from .tile_planner import plan_tiles
+
+try:
+    import onnx
+    from onnxruntime.quantization import (
+        CalibrationDataReader,
+        QuantFormat,
+        QuantType,
+        quantize_static,
+    )
+except ImportError:
+    onnx = None
+    CalibrationDataReader = object
+
+
+def load_images(image_dir):
+    """
+    Returns:
+        list of np.ndarray: BGR images saved in `image_dir` (DET0, ...), sorted by name
+    """
+    images = []
+    for path in sorted(Path(image_dir).glob("*.jpg")):
+        image = cv2.imread(str(path))
+        if image is None:
+            print(f"[model_quantizer] Could not read {path}, skipped")
+            continue
+        images.append(image)
+    return images
+
+
+class SavedImageCalibration(CalibrationDataReader):
+    """
+    Feeds saved detection images to the static quantiser, preprocessed
+    exactly like the CPU backend does. Each image is given both whole and
+    cut into a grid of tiles, the two ways the detector sees a frame, so
+    the activation ranges cover both.
+    """
+
+    def __init__(self, images, input_name, input_size, grid_size=(3, 3), overlap=0.15):
+        """
+        Args:
+            images (list of np.ndarray): BGR calibration images
+            input_name (str): Name of the model input
+            input_size (tuple): (width, height) of the model input
+            grid_size (tuple): (rows, cols) tiling added per image, None for whole frames only
+            overlap (float): Tile overlap, as used by the live detector
+        """
+        self.input_name = input_name
+        self.input_size = input_size
+        self.grid_size = grid_size
+        self.overlap = overlap
+        self._images = iter(images)
+        self._pending = []
+
+    def get_next(self):
+        if not self._pending:
+            image = next(self._images, None)
+            if image is None:
+                return None
+            self._pending = self._views(image)
+        blob = preprocess_images([self._pending.pop()], self.input_size)
+        return {self.input_name: blob}
+
+    def _views(self, image):
+        rgb = FramePyramid(image).full()
+        views = [rgb]
+        if self.grid_size is not None:
+            height, width = rgb.shape[:2]
+            for _, x1, y1, x2, y2 in plan_tiles(height, width, self.grid_size, self.overlap):
+                views.append(rgb[y1:y2, x1:x2])
+        return views
+
+
+def _model_input(model):
+    """
+    Returns:
+        tuple: (input name, (width, height)) of an NCHW image model
+    """
+    tensor = model.graph.input[0]
+    dims = [d.dim_value for d in tensor.type.tensor_type.shape.dim]
+    return tensor.name, (dims[3] or 300, dims[2] or 300)
+
+
+def quantize_int8(model_path, image_dir, output_path=None):
+    """
+    Statically quantise the FP32 model to INT8 (QDQ format, per-channel
+    weights), calibrated on our own saved images.
+
+    Args:
+        model_path (str): Path to the FP32 ONNX model
+        image_dir (str): Folder of saved detection images to calibrate on
+        output_path (str, optional): Defaults to precision_model_path(model_path, "int8")
+
+    Returns:
+        str: Path of the INT8 model
+    """
+    if onnx is None:
+        raise RuntimeError("INT8 quantisation needs the onnx and onnxruntime packages")
+    output_path = output_path or precision_model_path(model_path, "int8")
+    images = load_images(image_dir)
+    if not images:
+        raise RuntimeError(f"No calibration images in {image_dir}")
+
+    input_name, input_size = _model_input(onnx.load(model_path))
+    reader = SavedImageCalibration(images, input_name, input_size)
+    print(f"[model_quantizer] Calibrating on {len(images)} images from {image_dir}")
+    quantize_static(
+        model_path, output_path, reader,
+        quant_format=QuantFormat.QDQ, per_channel=True,
+        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8,
+    )
+    print(f"[model_quantizer] INT8 model saved to {output_path}")
+    return output_path
+
+
+def convert_fp16(model_path, output_path=None):
+    """
+    Convert the weights of the FP32 model to FP16. Inputs and outputs stay
+    FP32 so the backend feeds and decodes it unchanged.
+
+    Returns:
+        str: Path of the FP16 model
+    """
+    try:
+        import onnx
+        from onnxconverter_common import float16
+    except ImportError as e:
+        raise RuntimeError("FP16 conversion needs the onnx and onnxconverter-common packages") from e
+    output_path = output_path or precision_model_path(model_path, "fp16")
+    model = float16.convert_float_to_float16(onnx.load(model_path), keep_io_types=True)
+    onnx.save(model, output_path)
+    print(f"[model_quantizer] FP16 model saved to {output_path}")
+    return output_path
+
+
+def _match(reference, detections, iou_threshold):
+    """
+    Returns:
+        int: Detections of `detections` matching a reference detection of the
+        same class, each reference detection matched at most once
+    """
+    if not len(reference) or not len(detections):
+        return 0
+    iou = iou_matrix(detections.boxes, reference.boxes)
+    iou[detections.class_ids[:, None] != reference.class_ids[None, :]] = 0
+    matched = 0
+    for row in np.argsort(-detections.confs):
+        column = int(iou[row].argmax())
+        if iou[row, column] >= iou_threshold:
+            matched += 1
+            iou[:, column] = 0
+    return matched
+
+
+def compare_models(processors, image_dir, grids=(None, (3, 3)), overlap=0.15, repeats=3, iou_threshold=0.5):
+    """
+    Replay saved images through the detector at each precision and report
+    speed and agreement with the FP32 model. The FP32 detections are the
+    reference: precision is the share of a model's detections FP32 also
+    made, recall the share of FP32's detections the model kept.
+
+    Args:
+        processors (dict): precision -> ImageProcessor, must include "fp32"
+        image_dir (str): Folder of saved images to replay
+        grids (tuple): Grid sizes to measure, None for whole-frame detection
+        overlap (float): Tile overlap
+        repeats (int): Timed passes per grid, the fastest is reported
+        iou_threshold (float): Overlap for a detection to match the reference
+
+    Returns:
+        list of dict: One row per precision and grid
+    """
+    frames = {inx: FramePyramid(image) for inx, image in enumerate(load_images(image_dir))}
+    if not frames:
+        raise RuntimeError(f"No replay images in {image_dir}")
+
+    rows = []
+    for grid_size in grids:
+        reference = None
+        for precision in ["fp32"] + [p for p in processors if p != "fp32"]:
+            processor = processors[precision]
+            # Warm up once, then keep the fastest pass
+            results = processor.detect_batch(frames, grid_size=grid_size, overlap=overlap)
+            best = float("inf")
+            for _ in range(repeats):
+                start_time = time.time()
+                processor.detect_batch(frames, grid_size=grid_size, overlap=overlap)
+                best = min(best, time.time() - start_time)
+            if reference is None:
+                reference = results
+
+            made = sum(len(results[c]) for c in frames)
+            expected = sum(len(reference[c]) for c in frames)
+            matched = sum(_match(reference[c], results[c], iou_threshold) for c in frames)
+            rows.append({
+                "precision": precision,
+                "grid": grid_size,
+                "ms_per_frame": 1000 * best / len(frames),
+                "fps": len(frames) / best if best > 0 else 0.0,
+                "detections": made,
+                "precision_vs_fp32": matched / made if made else 1.0,
+                "recall_vs_fp32": matched / expected if expected else 1.0,
+            })
+    return rows
+
+
+def format_report(rows):
+    """
+    Returns:
+        str: The compare_models rows as a fixed-width table, speedups relative to FP32
+    """
+    lines = [f"{'model':<6} {'grid':<6} {'ms/frame':>9} {'fps':>7} {'speedup':>8} {'dets':>5} "
+             f"{'prec':>6} {'recall':>6}"]
+    fp32 = {row["grid"]: row["ms_per_frame"] for row in rows if row["precision"] == "fp32"}
+    for row in rows:
+        grid = "whole" if row["grid"] is None else f"{row['grid'][0]}x{row['grid'][1]}"
+        speedup = fp32[row["grid"]] / row["ms_per_frame"] if row["ms_per_frame"] else 0.0
+        lines.append(
+            f"{row['precision']:<6} {grid:<6} {row['ms_per_frame']:>9.1f} {row['fps']:>7.1f} "
+            f"{speedup:>7.2f}x {row['detections']:>5} {row['precision_vs_fp32']:>6.2f} "
+            f"{row['recall_vs_fp32']:>6.2f}"
+        )
+    return "\n".join(lines)
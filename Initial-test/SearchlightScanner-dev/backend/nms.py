@@ -0,0 +1,95 @@
+import numpy as np
+
+
+def non_max_suppression(boxes, scores, class_ids, threshold=0.5, metric="iou"):
+    """
+    Class-aware non-maximum suppression. Boxes of different classes never
+    suppress each other.
+
+    Args:
+        boxes (np.ndarray): (N, 4) boxes as left, top, right, bottom
+        scores (np.ndarray): (N,) confidences
+        class_ids (np.ndarray): (N,) class ids
+        threshold (float): Overlap above which the lower scoring box is dropped
+        metric (str): "iou" (intersection over union) or "ios" (intersection
+            over the smaller box), the latter also catches a box cut off by a
+            tile seam that lies inside the full box from a neighbouring tile
+
+    Returns:
+        tuple: (keep, kept_boxes) where keep holds the indices of the kept
+        boxes in descending score order and kept_boxes is an (len(keep), 4)
+        array of their coordinates
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    scores = np.asarray(scores, dtype=np.float32)
+    class_ids = np.asarray(class_ids)
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.intp), np.empty((0, 4), dtype=np.float32)
+
+    # Shift every class into its own coordinate range so one pass is class-aware
+    offsets = class_ids.astype(np.float32)[:, None] * (boxes.max() + 1.0)
+    shifted = boxes + offsets
+    x1, y1, x2, y2 = shifted.T
+    areas = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+    order = np.argsort(-scores, kind="stable")
+    keep = []
+    while order.size:
+        i = order[0]
+        rest = order[1:]
+        inter_w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        inter_h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = inter_w * inter_h
+        if metric == "ios":
+            denom = np.minimum(areas[i], areas[rest])
+        else:
+            denom = areas[i] + areas[rest] - inter
+        overlap = inter / np.maximum(denom, 1e-9)
+        suppressed = overlap > threshold
+        keep.append(i)
+        order = rest[~suppressed]
+
+    keep = np.asarray(keep, dtype=np.intp)
+    return keep, boxes[keep]
+
+
+def ios_matrix(boxes_a, boxes_b):
+    """
+    Pairwise intersection over the smaller box.
+
+    Args:
+        boxes_a (np.ndarray): (N, 4) boxes as left, top, right, bottom
+        boxes_b (np.ndarray): (M, 4) boxes as left, top, right, bottom
+
+    Returns:
+        np.ndarray: (N, M) intersection over the smaller area of every pair
+    """
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(1, -1, 4)
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(np.minimum(area_a, area_b), 1e-9)
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """
+    Pairwise intersection over union.
+
+    Args:
+        boxes_a (np.ndarray): (N, 4) boxes as left, top, right, bottom
+        boxes_b (np.ndarray): (M, 4) boxes as left, top, right, bottom
+
+    Returns:
+        np.ndarray: (N, M) IoU of every pair
+    """
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(1, -1, 4)
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-9)
@@ -1,4 +1,155 @@
+import numpy as np
+
+# One row per detection. Boxes are in full resolution frame coordinates,
+# tile_id is -1 for whole-frame detection and track_id -1 until a tracker
+# has assigned the detection to a track.
+DETECTION_DTYPE = np.dtype([
+    ("class_id", np.int16),
+    ("conf", np.float32),
+    ("x1", np.float32),
+    ("y1", np.float32),
+    ("x2", np.float32),
+    ("y2", np.float32),
+    ("camera_id", np.int16),
+    ("tile_id", np.int16),
+    ("timestamp", np.float64),
+    ("track_id", np.int32),
+])
+
+
+class DetectionSet:
+    """
+    Compact detection results backed by a numpy structured array. The saver,
+    sound manager, LED and UI all share the same set; iterating it yields
+    ScannerDetection row views instead of building an object per detection.
+    """
+
+    __slots__ = ("rows", "labels")
+
+    def __init__(self, rows, labels):
+        """
+        Args:
+            rows (np.ndarray): Structured array of DETECTION_DTYPE
+            labels (list of str): Class id -> label table
+        """
+        self.rows = rows
+        self.labels = labels
+
+    @classmethod
+    def empty(cls, labels):
+        return cls(np.empty(0, dtype=DETECTION_DTYPE), labels)
+
+    @classmethod
+    def from_columns(cls, labels, class_ids, confs, boxes, camera_id, tile_ids, timestamp):
+        """
+        Build a set from per-column arrays.
+
+        Args:
+            labels (list of str): Class id -> label table
+            class_ids (np.ndarray): (K,) class ids
+            confs (np.ndarray): (K,) confidences
+            boxes (np.ndarray): (K, 4) left, top, right, bottom
+            camera_id (int): Camera every row came from
+            tile_ids (np.ndarray): (K,) tile ids, -1 for whole frame
+            timestamp (float): Capture time of the frame
+        """
+        rows = np.empty(len(class_ids), dtype=DETECTION_DTYPE)
+        rows["class_id"] = class_ids
+        rows["conf"] = confs
+        rows["x1"], rows["y1"], rows["x2"], rows["y2"] = np.asarray(boxes, dtype=np.float32).reshape(-1, 4).T
+        rows["camera_id"] = camera_id
+        rows["tile_id"] = tile_ids
+        rows["timestamp"] = timestamp
+        rows["track_id"] = -1
+        return cls(rows, labels)
+
+    @property
+    def boxes(self):
+        """
+        Returns:
+            np.ndarray: (K, 4) float32 left, top, right, bottom
+        """
+        return np.stack((self.rows["x1"], self.rows["y1"], self.rows["x2"], self.rows["y2"]), axis=1)
+
+    @property
+    def class_ids(self):
+        return self.rows["class_id"]
+
+    @property
+    def confs(self):
+        return self.rows["conf"]
+
+    def select(self, mask):
+        """
+        Returns:
+            DetectionSet: The rows selected by a boolean mask or index array
+        """
+        return DetectionSet(self.rows[mask], self.labels)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __bool__(self):
+        return len(self.rows) > 0
+
+    def __getitem__(self, inx):
+        return ScannerDetection(self, inx)
+
+    def __iter__(self):
+        for inx in range(len(self.rows)):
+            yield ScannerDetection(self, inx)
+
+
 class ScannerDetection:
-    def __init__(self, label, conf):
-        self.label = label
-        self.conf = conf
+    """
+    Lightweight view of one row of a DetectionSet.
+    """
+
+    __slots__ = ("_set", "_inx")
+
+    def __init__(self, detection_set, inx):
+        self._set = detection_set
+        self._inx = inx
+
+    @property
+    def _row(self):
+        return self._set.rows[self._inx]
+
+    @property
+    def class_id(self):
+        return int(self._row["class_id"])
+
+    @property
+    def label(self):
+        class_id = self.class_id
+        labels = self._set.labels
+        return labels[class_id] if 0 <= class_id < len(labels) else str(class_id)
+
+    @property
+    def conf(self):
+        return float(self._row["conf"])
+
+    @property
+    def box(self):
+        # (left, top, right, bottom) in full resolution frame coordinates
+        row = self._row
+        return float(row["x1"]), float(row["y1"]), float(row["x2"]), float(row["y2"])
+
+    @property
+    def camera_id(self):
+        return int(self._row["camera_id"])
+
+    @property
+    def tile_id(self):
+        # Segmentation tile the detection came from, None for whole-frame detection
+        tile_id = int(self._row["tile_id"])
+        return tile_id if tile_id >= 0 else None
+
+    @property
+    def timestamp(self):
+        return float(self._row["timestamp"])
+
+    @property
+    def track_id(self):
+        track_id = int(self._row["track_id"])
+        return track_id if track_id >= 0 else None
@@ -6,21 +6,25 @@ import piexif
 import os
 
 from frontend.application_current_settings_route import current_settings_route
+from frontend.shared_labels_controller import shared_labels
 from constants.constantsmanager import ConstantsManager
 from fractions import Fraction
+from .frame_pyramid import FramePyramid
 
 
 class ScannerImage:
     custom_font_path = None
     potential_font_path = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
 
-    def __init__(self, image, detections, gps_coords):
+    def __init__(self, image, detections, gps_coords, quality=None):
         self.constants_manager = ConstantsManager(filename=current_settings_route)
         self.font_color = eval(self.constants_manager.get_constant("image_font_color"))
         self.font_size = self.constants_manager.get_constant("image_font_size")
         self.image = image
         self.detections = detections
         self.gps_coords = gps_coords
+        # FrameQuality of the frame, None when it was not scored
+        self.quality = quality
         self.date_time = datetime.now().strftime("%Y-%m-%d_%H-%M-%S-%f")[:-3]
         self.exif_bytes = None
         if ScannerImage.custom_font_path is None:
@@ -28,6 +32,10 @@ class ScannerImage:
                 ScannerImage.custom_font_path = ScannerImage.potential_font_path
 
     def _annotate(self):
+        if isinstance(self.image, FramePyramid):
+            # Decoded here, on the saver thread, and only for frames that are kept.
+            # fromarray copies RGB data, so the shared pyramid level is not drawn on
+            self.image = self.image.full()
         if isinstance(self.image, np.ndarray):
             self.image = Image.fromarray(self.image)
 
@@ -62,6 +70,17 @@ class ScannerImage:
 
         draw.text((10, 10), full_line, fill=self.font_color, font=font)
 
+        for detection, box in zip(self.detections, self.detections.boxes):
+            left, top, right, bottom = (int(v) for v in box)
+            color = tuple(shared_labels.get_color(detection.label))
+            draw.rectangle([left, top, right, bottom], outline=color, width=3)
+            draw.text(
+                (left, max(top - self.font_size - 4, 0)),
+                f"{detection.label} {detection.conf:.2f}",
+                fill=color,
+                font=font,
+            )
+
     def _set_gps_coords(self):
         if self.gps_coords is None:
             return
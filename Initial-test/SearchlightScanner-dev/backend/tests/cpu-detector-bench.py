@@ -0,0 +1,40 @@
+import sys
+import time
+from pathlib import Path
+
+import cv2
+
+sys.path.append("/home/sar/SearchlightScannerV4/Initial-test/SearchlightScanner-dev")
+from backend.frame_pyramid import FramePyramid
+from backend.image_processor import ImageProcessor
+
+"""
+Benchmark the CPU detector backend on saved detection images, no GPU needed.
+Usage: python3 backend/tests/cpu-detector-bench.py models/ssd-mobilenet.onnx DET0 [threads]
+"""
+
+
+def main():
+    model_path = sys.argv[1]
+    image_dir = sys.argv[2]
+    threads = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+
+    ai = ImageProcessor(model_path=model_path, backend="cpu", threads=threads)
+    frames = {
+        inx: FramePyramid(cv2.imread(str(path)))
+        for inx, path in enumerate(sorted(Path(image_dir).glob("*.jpg")))
+    }
+
+    for grid_size in (None, (3, 3)):
+        start_time = time.time()
+        results = ai.detect_batch(frames, grid_size=grid_size, overlap=0.15)
+        time_taken = time.time() - start_time
+        total = sum(len(detections) for detections in results.values())
+        print(f"Grid {grid_size}: {len(frames)} frames, {total} detections, {time_taken:.3f} seconds")
+        for camera_id, detections in results.items():
+            for detection in detections:
+                print(f"  frame {camera_id}: {detection.label} {detection.conf:.2f} {detection.box}")
+
+
+if __name__ == "__main__":
+    main()
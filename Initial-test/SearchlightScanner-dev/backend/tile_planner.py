@@ -0,0 +1,42 @@
+import math
+from functools import lru_cache
+
+
+@lru_cache(maxsize=64)
+def plan_tiles(height, width, grid_size, overlap=0.0):
+    """
+    Split a frame into a grid of tiles that overlap their neighbours, so a
+    target sitting on a seam is fully contained in at least one tile.
+    Plans are cached since the frame size and grid rarely change.
+
+    Args:
+        height (int): Frame height in pixels
+        width (int): Frame width in pixels
+        grid_size (tuple): (rows, cols) of the grid
+        overlap (float): Fraction of a tile shared with each neighbour (0 to <1)
+
+    Returns:
+        tuple: (tile_id, left, top, right, bottom) for every tile, row-major
+    """
+    rows, cols = grid_size
+    row_spans = _spans(height, rows, overlap)
+    col_spans = _spans(width, cols, overlap)
+    tiles = []
+    for i, (top, bottom) in enumerate(row_spans):
+        for j, (left, right) in enumerate(col_spans):
+            tiles.append((i * cols + j, left, top, right, bottom))
+    return tuple(tiles)
+
+
+def _spans(length, count, overlap):
+    """
+    Evenly place `count` equal spans along `length`, neighbours overlapping by
+    `overlap` of a span, with the first starting at 0 and the last ending at
+    `length`.
+    """
+    if count <= 1:
+        return [(0, length)]
+    size = min(length, int(math.ceil(length / (count - (count - 1) * overlap))))
+    stride = (length - size) / (count - 1)
+    return [(int(round(k * stride)), int(round(k * stride)) + size) for k in range(count)]
+
@@ -0,0 +1,115 @@
+import math
+
+import numpy as np
+
+
+class TileScheduler:
+    """
+    Picks which tiles of one camera's grid run inference on a frame when the
+    grid is too large to run every tile every frame.
+
+    The per-frame budget is split in two. Rotation slots walk a cursor
+    through the grid so every tile is visited at least once every
+    revisit_interval() frames no matter what. Priority slots go to tiles with
+    a recent detection, then to tiles flagged as changed, oldest first; any
+    priority slot left over is given back to the rotation.
+    """
+
+    def __init__(self, budget, priority_fraction=0.5, hot_frames=5):
+        """
+        Args:
+            budget (int): Tiles to run per frame
+            priority_fraction (float): Share of the budget reserved for hot and changed tiles
+            hot_frames (int): Frames a tile stays hot after a detection
+        """
+        self.priority_fraction = priority_fraction
+        self.set_budget(budget)
+        self.hot_frames = hot_frames
+        self.tiles = None
+        self.cursor = 0
+        self.age = None
+        self.hot = None
+
+    def set_budget(self, budget):
+        """
+        Change the tiles run per frame, keeping the rotation and hot tile state.
+        """
+        self.budget = max(1, int(budget))
+        self.priority_slots = min(self.budget - 1, int(self.budget * self.priority_fraction))
+        self.rotation_slots = self.budget - self.priority_slots
+
+    def revisit_interval(self, num_tiles):
+        """
+        Returns:
+            int: Worst-case frames between two visits of any tile
+        """
+        if num_tiles <= self.budget:
+            return 1
+        return math.ceil(num_tiles / self.rotation_slots)
+
+    def select(self, tiles, changed=None, excluded=None):
+        """
+        Args:
+            tiles (tuple): Tile plan from tile_planner.plan_tiles
+            changed (np.ndarray, optional): Boolean mask of tiles the change
+                detector flagged
+            excluded (np.ndarray, optional): Boolean mask of tiles never to
+                run (fully masked), their share of the budget goes to the rest
+
+        Returns:
+            np.ndarray: Boolean mask of the tiles to run this frame
+        """
+        num_tiles = len(tiles)
+        if tiles is not self.tiles:
+            self.tiles = tiles
+            self.cursor = 0
+            self.age = np.zeros(num_tiles, dtype=np.int32)
+            self.hot = np.zeros(num_tiles, dtype=np.int32)
+
+        self.age += 1
+        eligible = np.ones(num_tiles, dtype=bool) if excluded is None else ~excluded
+        if changed is not None:
+            changed = changed & eligible
+        if eligible.sum() <= self.budget:
+            active = eligible.copy() if changed is None else changed.copy()
+        else:
+            active = np.zeros(num_tiles, dtype=bool)
+
+            # Hot tiles first, then changed ones, oldest first within each group
+            priority = np.zeros(num_tiles, dtype=np.int64)
+            if changed is not None:
+                priority[changed] = 1
+            priority[self.hot > 0] = 2
+            priority[~eligible] = 0
+            candidates = np.flatnonzero(priority > 0)
+            order = np.lexsort((-self.age[candidates], -priority[candidates]))
+            chosen = candidates[order[:self.priority_slots]]
+            active[chosen] = True
+
+            rotation = self.rotation_slots + self.priority_slots - len(chosen)
+            while rotation > 0 and not active[eligible].all():
+                if eligible[self.cursor] and not active[self.cursor]:
+                    active[self.cursor] = True
+                    rotation -= 1
+                self.cursor = (self.cursor + 1) % num_tiles
+
+        self.age[active | ~eligible] = 0
+        self.hot = np.maximum(self.hot - 1, 0)
+        return active
+
+    def mark_hot(self, tile_ids):
+        """
+        Flag tiles that just produced detections so they are revisited sooner.
+        """
+        if self.hot is None:
+            return
+        tile_ids = np.asarray(tile_ids, dtype=np.intp)
+        tile_ids = tile_ids[(tile_ids >= 0) & (tile_ids < len(self.hot))]
+        self.hot[tile_ids] = self.hot_frames
+
+    def max_age(self):
+        """
+        Returns:
+            int: Frames since the least recently visited tile was run
+        """
+        return int(self.age.max()) if self.age is not None and len(self.age) else 0
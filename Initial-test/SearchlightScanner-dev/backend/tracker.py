@@ -0,0 +1,194 @@
+import numpy as np
+
+from .nms import iou_matrix
+from .scanner_detection import DETECTION_DTYPE, DetectionSet
+
+
+class KalmanBoxTracker:
+    """
+    Constant velocity Kalman filter over one box, as in SORT. The state is
+    (centre x, centre y, area, aspect ratio) plus the velocities of the first
+    three, with velocities in units per second so predictions follow the
+    real time between frames.
+    """
+
+    def __init__(self, box, class_id, conf, track_id, timestamp):
+        self.track_id = track_id
+        self.class_id = class_id
+        self.conf = conf
+        self.timestamp = timestamp
+        self.hits = 1
+        self.misses = 0
+
+        self.x = np.zeros(7, dtype=np.float64)
+        self.x[:4] = self._box_to_z(box)
+        self.P = np.diag([10.0, 10.0, 10.0, 10.0, 1e4, 1e4, 1e4])
+        self.Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 0.0001])
+        self.R = np.diag([1.0, 1.0, 10.0, 10.0])
+        self.H = np.eye(4, 7)
+
+    @staticmethod
+    def _box_to_z(box):
+        left, top, right, bottom = box
+        width, height = right - left, bottom - top
+        return np.array([left + width / 2, top + height / 2, width * height, width / max(height, 1e-6)])
+
+    def predict(self, timestamp):
+        dt = max(timestamp - self.timestamp, 0.0)
+        self.timestamp = timestamp
+        if dt == 0:
+            return
+        if self.x[2] + self.x[6] * dt <= 0:
+            self.x[6] = 0.0
+        transition = np.eye(7)
+        transition[0, 4] = transition[1, 5] = transition[2, 6] = dt
+        self.x = transition @ self.x
+        self.P = transition @ self.P @ transition.T + self.Q * dt
+
+    def update(self, box, conf):
+        z = self._box_to_z(box)
+        y = z - self.H @ self.x
+        innovation_cov = self.H @ self.P @ self.H.T + self.R
+        gain = self.P @ self.H.T @ np.linalg.inv(innovation_cov)
+        self.x = self.x + gain @ y
+        self.P = (np.eye(7) - gain @ self.H) @ self.P
+        self.conf = conf
+        self.hits += 1
+        self.misses = 0
+
+    def box(self):
+        cx, cy, area, ratio = self.x[:4]
+        width = np.sqrt(max(area * ratio, 0.0))
+        height = area / width if width > 0 else 0.0
+        return cx - width / 2, cy - height / 2, cx + width / 2, cy + height / 2
+
+    def position_std(self):
+        return np.sqrt(self.P[0, 0]), np.sqrt(self.P[1, 1])
+
+
+class Sort:
+    """
+    SORT-style multi-object tracker for one camera. Detections are matched to
+    predicted tracks by IoU (class-aware, greedy), unmatched detections start
+    new tracks and tracks missed for more than `max_age` inference frames are
+    dropped. Between inference frames predict() propagates the tracked boxes.
+    """
+
+    def __init__(self, labels, camera_id, max_age=5, min_hits=1, iou_threshold=0.3, max_position_std=0.25,
+                 min_box_px=16):
+        """
+        Args:
+            labels (list of str): Class id -> label table for the output sets
+            camera_id (int): Camera this tracker belongs to
+            max_age (int): Inference frames a track survives without a match
+            min_hits (int): Matches needed before a track is confirmed (and reported as new)
+            iou_threshold (float): Minimum IoU to match a detection to a track
+            max_position_std (float): Position uncertainty, as a fraction of the
+                box size, above which the tracker asks for a fresh inference
+            min_box_px (int): Smallest box size, in pixels, the uncertainty is
+                measured against. The filter's own noise is about a pixel, so
+                without a floor a box a few pixels wide would never be trusted
+        """
+        self.labels = labels
+        self.camera_id = camera_id
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.iou_threshold = iou_threshold
+        self.max_position_std = max_position_std
+        self.min_box_px = min_box_px
+        self.tracks = []
+        self._next_id = 0
+
+    def predict(self, timestamp):
+        """
+        Propagate every confirmed track to the given time.
+
+        Returns:
+            DetectionSet: The predicted boxes of the confirmed tracks
+        """
+        for track in self.tracks:
+            track.predict(timestamp)
+        return self._as_set([t for t in self.tracks if t.hits >= self.min_hits], timestamp)
+
+    def update(self, detections, timestamp):
+        """
+        Associate a fresh set of detections with the tracks. The track_id
+        column of `detections` is filled in place.
+
+        Returns:
+            DetectionSet: The rows of `detections` that confirmed a new track
+        """
+        for track in self.tracks:
+            track.predict(timestamp)
+
+        boxes = detections.boxes
+        class_ids = detections.class_ids
+        matched_tracks = set()
+        new_rows = []
+
+        if len(self.tracks) and len(detections):
+            track_boxes = np.array([t.box() for t in self.tracks])
+            track_classes = np.array([t.class_id for t in self.tracks])
+            iou = iou_matrix(track_boxes, boxes)
+            iou[track_classes[:, None] != class_ids[None, :]] = 0.0
+            # Greedy assignment, best overlaps first
+            for flat in np.argsort(-iou, axis=None):
+                t_inx, d_inx = np.unravel_index(flat, iou.shape)
+                if iou[t_inx, d_inx] < self.iou_threshold:
+                    break
+                if t_inx in matched_tracks or detections.rows["track_id"][d_inx] >= 0:
+                    continue
+                track = self.tracks[t_inx]
+                was_confirmed = track.hits >= self.min_hits
+                track.update(boxes[d_inx], float(detections.confs[d_inx]))
+                matched_tracks.add(t_inx)
+                detections.rows["track_id"][d_inx] = track.track_id
+                if not was_confirmed and track.hits >= self.min_hits:
+                    new_rows.append(d_inx)
+
+        for t_inx, track in enumerate(self.tracks):
+            if t_inx not in matched_tracks:
+                track.misses += 1
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_age]
+
+        for d_inx in np.flatnonzero(detections.rows["track_id"] < 0):
+            track = KalmanBoxTracker(
+                boxes[d_inx], int(class_ids[d_inx]), float(detections.confs[d_inx]), self._next_id, timestamp
+            )
+            self._next_id += 1
+            self.tracks.append(track)
+            detections.rows["track_id"][d_inx] = track.track_id
+            if track.hits >= self.min_hits:
+                new_rows.append(d_inx)
+
+        return detections.select(np.array(sorted(new_rows), dtype=np.intp))
+
+    def reset(self):
+        """
+        Drop every track, e.g. when the frame coordinates changed. Track ids
+        keep counting so new tracks are not mistaken for old ones.
+        """
+        self.tracks = []
+
+    def is_uncertain(self):
+        """
+        Returns:
+            bool: True when a track is unconfirmed, missed its last match or
+            its predicted position has drifted too far to trust
+        """
+        for track in self.tracks:
+            if track.hits < self.min_hits or track.misses > 0:
+                return True
+            left, top, right, bottom = track.box()
+            std_x, std_y = track.position_std()
+            width = max(right - left, self.min_box_px)
+            height = max(bottom - top, self.min_box_px)
+            if std_x > self.max_position_std * width or std_y > self.max_position_std * height:
+                return True
+        return False
+
+    def _as_set(self, tracks, timestamp):
+        rows = np.empty(len(tracks), dtype=DETECTION_DTYPE)
+        for inx, track in enumerate(tracks):
+            rows[inx] = (track.class_id, track.conf, *track.box(), self.camera_id, -1, timestamp, track.track_id)
+        return DetectionSet(rows, self.labels)
@@ -1,66 +1,448 @@
+import threading
+import time
+import zlib
+
 import cv2
+import numpy as np
+
+from .cam_utils import fourcc_name
+from .frame_pyramid import FramePyramid, is_encoded
+
+
+def frame_fingerprint(frame, grid=32):
+    """
+    Cheap fingerprint of a frame: a CRC of a grid x grid subsample of its
+    pixels. Live sensors never produce two byte-identical frames, so equal
+    fingerprints mean the driver handed back the same buffer again.
+
+    Args:
+        frame (np.ndarray): Decoded image or compressed MJPEG buffer
+
+    Returns:
+        int: The fingerprint
+    """
+    if is_encoded(frame):
+        # Compressed buffers are small, checksum all of it
+        return zlib.crc32(np.ascontiguousarray(frame))
+    height, width = frame.shape[:2]
+    step_y, step_x = max(1, height // grid), max(1, width // grid)
+    sample = frame[step_y // 2::step_y, step_x // 2::step_x]
+    return zlib.crc32(np.ascontiguousarray(sample))
+
+
+class LatestFrame:
+    """
+    Single-slot buffer holding the newest frame decoded by a capture thread.
+    Writers overwrite the slot, readers never block waiting for a new frame.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._frame = None
+        self._frame_id = 0
+        self._timestamp = 0.0
+        self._fingerprint = None
+        # Identical frames received in a row, and in total
+        self.repeats = 0
+        self.duplicates = 0
+
+    def put(self, frame, timestamp, fingerprint=None):
+        """
+        Store a new frame. A frame with the same fingerprint as the one in
+        the slot is a repeat: it is counted and dropped, so the frame id does
+        not move and nothing downstream runs on it again.
+
+        Returns:
+            bool: False when the frame was dropped as a repeat
+        """
+        with self._lock:
+            if fingerprint is not None and fingerprint == self._fingerprint:
+                self.repeats += 1
+                self.duplicates += 1
+                return False
+            self._frame = frame
+            self._frame_id += 1
+            self._timestamp = timestamp
+            self._fingerprint = fingerprint
+            self.repeats = 0
+            return True
+
+    def get(self):
+        """
+        Returns:
+            tuple: (frame_id, timestamp, frame). frame_id is 0 and frame is
+            None until the first frame has been captured.
+        """
+        with self._lock:
+            return self._frame_id, self._timestamp, self._frame
+
+    def clear(self):
+        with self._lock:
+            self._frame = None
+            self._fingerprint = None
+            self.repeats = 0
+
 
 class CameraManager:
     """
     Class for managing the camera.
-    This class uses videoSource from jetson_utils or falls back to OpenCV.
+    Frames are read by a background capture thread into a LatestFrame slot so
+    the UI and the detector can take the newest frame without blocking.
+
+    In raw MJPEG mode the driver's compressed buffers are stored as they
+    come, without OpenCV decoding them; FramePyramid decodes each one at the
+    reduced scale its consumers need.
+
+    Codec, resolution, frame rate and device can be changed while running
+    (see reconfigure). The capture thread renegotiates between two reads
+    and the last frame stays in the slot meanwhile, so the rest of the
+    pipeline keeps running and picks up the new size with the first frame
+    that has it. A camera that loses its capture is reopened with its
+    current settings every `reconnect_interval` seconds.
     """
 
-    def __init__(self, source, width, height):
+    reconnect_interval = 2.0
+
+    def __init__(self, source, width, height, stall_frames=30, codec=None, fps=30, raw_mjpeg=False):
+        """
+        Args:
+            source (str): V4L2 device path
+            width (int): Requested capture width
+            height (int): Requested capture height
+            stall_frames (int): Identical frames in a row after which the
+                camera is reported as stalled
+            codec (str, optional): FOURCC the camera is known to work with,
+                as negotiated by cam_utils.find_working_cameras. The camera
+                is opened with it directly. Without one MJPG is tried
+                first, then YUYV.
+            fps (int): Requested frame rate
+            raw_mjpeg (bool): Keep MJPEG frames compressed, only used when
+                the camera runs MJPG
+        """
         self.source = source
+        self.stall_frames = stall_frames
+        self.raw_mjpeg_requested = raw_mjpeg
+        # Requested capture settings, updated by reconfigure
+        self.codec = codec
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self._pending_config = None
+        self._config_lock = threading.Lock()
+        # True while the capture thread renegotiates the device
+        self.reconfiguring = False
         self.cap = None
         self.connected = False
+        self.raw_mjpeg = False
+        self.latest = LatestFrame()
+        self._cap_lock = threading.Lock()
+        self._running = False
+        self._thread = None
+        self._connect()
 
-        # Try MJPEG
-        self.cap = cv2.VideoCapture(source, cv2.CAP_V4L2)
-        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
-        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
-        self.cap.set(cv2.CAP_PROP_FPS, 30)
-
-        ret, frame = self.cap.read()
-        if not ret or frame is None or frame.shape[0] < 100:
-            print(f"[CameraManager] MJPG failed on {source}, trying YUYV")
-            self.cap.release()
-            self.cap = cv2.VideoCapture(source, cv2.CAP_V4L2)
-            self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'YUYV'))
-            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
-            self.cap.set(cv2.CAP_PROP_FPS, 30)
+    def _connect(self):
+        """
+        Open the camera with the current settings and start capturing.
+        Without a codec MJPG is tried first, then YUYV.
+        """
+        if self.codec is not None:
+            self.cap = self._open(self.source, self.codec, self.width, self.height, self.fps)
+        else:
+            # Try MJPEG
+            self.cap = self._open(self.source, 'MJPG', self.width, self.height, self.fps)
+            ret, frame = self.cap.read()
+            if not ret or frame is None or frame.shape[0] < 100:
+                print(f"[CameraManager] MJPG failed on {self.source}, trying YUYV")
+                self.cap.release()
+                self.cap = self._open(self.source, 'YUYV', self.width, self.height, self.fps)
 
+        self.raw_mjpeg = False
         if self.cap.isOpened():
             self.connected = True
-            print(f"[CameraManager] Connected to {source}")
+            print(f"[CameraManager] Connected to {self.source}")
+            self.codec = self.get_codec()
+            self.raw_mjpeg = self._set_raw_mjpeg(self.cap)
+            self.start()
         else:
-            print(f"[CameraManager] Failed to open {source}")
+            print(f"[CameraManager] Failed to open {self.source}")
+            self.connected = False
             self.cap = None
 
+    @staticmethod
+    def _open(source, codec, width, height, fps):
+        cap = cv2.VideoCapture(source, cv2.CAP_V4L2)
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*codec))
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        cap.set(cv2.CAP_PROP_FPS, fps)
+        return cap
+
+    @staticmethod
+    def _usable(ret, frame):
+        return ret and frame is not None and frame.size > 0 and (is_encoded(frame) or frame.shape[0] >= 100)
+
+    def _set_raw_mjpeg(self, cap):
+        """
+        Returns:
+            bool: True when raw MJPEG capture was requested and switched on for `cap`
+        """
+        fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+        if not self.raw_mjpeg_requested or fourcc != cv2.VideoWriter_fourcc(*"MJPG"):
+            return False
+        raw = bool(cap.set(cv2.CAP_PROP_CONVERT_RGB, 0))
+        print(f"[CameraManager] Raw MJPEG capture on {self.source}: {'on' if raw else 'not supported'}")
+        return raw
+
+    def reconfigure(self, source=None, codec=None, width=None, height=None, fps=None):
+        """
+        Change the device, codec, resolution or frame rate of a running
+        camera. Settings not given stay as they are, except the codec,
+        which is negotiated again on a new device. The capture thread
+        renegotiates before its next read; if the camera does not deliver
+        frames with the new settings the previous ones are restored.
+
+        Args:
+            source (str, optional): V4L2 device path to switch to
+            codec (str, optional): FOURCC to capture with
+            width (int, optional): Requested capture width
+            height (int, optional): Requested capture height
+            fps (int, optional): Requested frame rate
+        """
+        source = source or self.source
+        if codec is None and source == self.source:
+            codec = self.codec
+        config = {
+            "source": source,
+            "codec": codec,
+            "width": width or self.width,
+            "height": height or self.height,
+            "fps": fps or self.fps,
+        }
+        if not self._running:
+            # No capture thread to hand over to, open directly
+            self.release()
+            if config["source"] != self.source:
+                self.latest.clear()
+            self.source, self.codec = config["source"], config["codec"]
+            self.width, self.height, self.fps = config["width"], config["height"], config["fps"]
+            self._connect()
+            return
+        with self._config_lock:
+            self._pending_config = config
+            self.reconfiguring = True
+
+    def _apply_config(self, config):
+        """
+        Runs on the capture thread. A new device is opened before the old
+        one is closed; the same device has to be closed first, V4L2 only
+        lets one handle stream. The camera counts as connected meanwhile.
+        When neither the new nor the previous settings give frames the
+        camera is left without a capture for the reconnect path.
+        """
+        try:
+            self._switch(config)
+        finally:
+            with self._config_lock:
+                self.reconfiguring = self._pending_config is not None
+
+    def _switch(self, config):
+        previous = {"source": self.source, "codec": self.codec, "width": self.width,
+                    "height": self.height, "fps": self.fps}
+        if config == previous:
+            return
+        same_device = config["source"] == self.source
+        if same_device:
+            with self._cap_lock:
+                old, self.cap = self.cap, None
+            if old is not None:
+                old.release()
+
+        cap, frame = self._negotiate(config)
+        if cap is None:
+            print(f"[CameraManager] {config['source']} gives no frames at {config['width']}x{config['height']} "
+                  f"{config['codec']} {config['fps']} fps, keeping the previous settings")
+            if not same_device:
+                return
+            config = previous
+            cap, frame = self._negotiate(config)
+            if cap is None:
+                print(f"[CameraManager] Could not restore {self.source}, "
+                      f"retrying every {self.reconnect_interval:g} seconds")
+                self.connected = False
+                self.latest.clear()
+                return
+
+        with self._cap_lock:
+            old, self.cap = self.cap, cap
+        if old is not None:
+            old.release()
+        if not same_device:
+            self.latest.clear()
+        self.source = config["source"]
+        self.codec = self.get_codec()
+        self.width, self.height, self.fps = config["width"], config["height"], config["fps"]
+        self.raw_mjpeg = self._set_raw_mjpeg(cap)
+        self.latest.put(frame, time.time(), frame_fingerprint(frame))
+        print(f"[CameraManager] {self.source} now {frame.shape[1]}x{frame.shape[0]} {self.codec} "
+              f"@ {cap.get(cv2.CAP_PROP_FPS):g} fps")
+
+    def _negotiate(self, config):
+        """
+        Returns:
+            tuple: (cap, first frame) opened with the config, MJPG then YUYV
+            when it names no codec, (None, None) when nothing delivers frames
+        """
+        for codec in ([config["codec"]] if config["codec"] else ["MJPG", "YUYV"]):
+            cap = self._open(config["source"], codec, config["width"], config["height"], config["fps"])
+            ret, frame = cap.read() if cap.isOpened() else (False, None)
+            if self._usable(ret, frame):
+                return cap, frame
+            cap.release()
+        return None, None
+
+    def start(self):
+        """
+        Starts the background capture thread.
+        """
+        if self._running or not self.is_connected():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops the background capture thread.
+        """
+        self._running = False
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        self._thread = None
+
+    def _capture_loop(self):
+        """
+        Reads frames as fast as the camera delivers them and keeps only the
+        newest one, decoded or, in raw MJPEG mode, still compressed.
+        """
+        while self._running:
+            with self._config_lock:
+                config, self._pending_config = self._pending_config, None
+            if config is not None:
+                self._apply_config(config)
+
+            with self._cap_lock:
+                if self.cap is None or not self.cap.isOpened():
+                    ret, frame = False, None
+                else:
+                    ret, frame = self.cap.read()
+            if self.cap is None:
+                self._reconnect()
+                continue
+
+            if not self._usable(ret, frame):
+                self.latest.clear()
+                time.sleep(0.05)
+                continue
+
+            self.latest.put(frame, time.time(), frame_fingerprint(frame))
+
+    def _reconnect(self):
+        """
+        Runs on the capture thread while it has no capture: reopen the
+        camera with its current settings, then wait before the next try.
+        """
+        current = {"source": self.source, "codec": self.codec, "width": self.width,
+                   "height": self.height, "fps": self.fps}
+        cap, frame = self._negotiate(current)
+        if cap is None:
+            time.sleep(self.reconnect_interval)
+            return
+        with self._cap_lock:
+            self.cap = cap
+        self.connected = True
+        self.raw_mjpeg = self._set_raw_mjpeg(cap)
+        self.latest.put(frame, time.time(), frame_fingerprint(frame))
+        print(f"[CameraManager] Reconnected to {self.source}")
+
+    def get_latest(self):
+        """
+        Returns the newest captured frame without blocking.
+
+        Returns:
+            tuple: (frame_id, timestamp, frame), see LatestFrame.get. In raw
+            MJPEG mode frame is the compressed buffer, wrap it in a
+            FramePyramid to decode it.
+        """
+        return self.latest.get()
+
     def read(self):
+        """
+        Returns:
+            tuple: (ret, frame) with the newest frame decoded to BGR
+        """
         if self.is_connected():
-            return self.cap.read()
+            _, _, frame = self.latest.get()
+            if frame is not None and is_encoded(frame):
+                frame = cv2.imdecode(frame, cv2.IMREAD_COLOR)
+            return frame is not None, frame
         return False, None
 
+    def is_stalled(self):
+        """
+        Returns:
+            bool: True while the camera keeps returning the same frame
+        """
+        return self.latest.repeats >= self.stall_frames
+
     def is_connected(self):
-        return self.cap is not None and self.cap.isOpened()
+        """
+        Returns:
+            bool: True while the camera is open or being reconfigured
+        """
+        return self.reconfiguring or (self.cap is not None and self.cap.isOpened())
 
-    def change_camera(self, source):
-        self.release()
-        self.__init__(source, 1280, 720)
+    def is_reconfiguring(self):
+        return self.reconfiguring
+
+    def change_camera(self, source, width=None, height=None, codec=None):
+        """
+        Switch to another device, keeping the current resolution unless
+        given. The codec is negotiated again unless given.
+        """
+        self.reconfigure(source=source, codec=codec, width=width, height=height)
 
     def change_resolution(self, width, height):
-        if self.cap:
-            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
-            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        self.reconfigure(width=width, height=height)
 
     def capture(self):
-        ret, frame = self.read()
-        if ret:
-            return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        return None
+        """
+        Returns:
+            np.ndarray: The newest frame as RGB, None without one
+        """
+        if not self.is_connected():
+            return None
+        _, timestamp, frame = self.latest.get()
+        return FramePyramid(frame, timestamp).full() if frame is not None else None
+
+    def get_codec(self):
+        """
+        Returns:
+            str: FOURCC the driver is delivering, e.g. "MJPG"
+        """
+        cap = self.cap
+        if cap is None or not cap.isOpened():
+            return None
+        return fourcc_name(cap)
 
     def getFPS(self):
-        return self.cap.get(cv2.CAP_PROP_FPS) if self.is_connected() else 0
+        cap = self.cap
+        return cap.get(cv2.CAP_PROP_FPS) if cap is not None and cap.isOpened() else 0
 
     def release(self):
-        if self.cap and self.cap.isOpened():
-            self.cap.release()
+        self.stop()
+        with self._config_lock:
+            self._pending_config = None
+            self.reconfiguring = False
+        with self._cap_lock:
+            if self.cap and self.cap.isOpened():
+                self.cap.release()
@@ -0,0 +1,67 @@
+import itertools
+import sys
+
+import cv2
+
+from backend.cam_utils import CameraCache, device_identities
+from backend.camera_overlap import estimate_overlap
+from constants.constantsmanager import ConstantsManager
+from frontend.application_current_settings_route import current_settings_route
+
+"""
+Calibrate which cameras of the rig overlap. Point the rig at a textured
+scene (the ramp, a harbour) and run with the application closed:
+    python3 calibrate_overlaps.py [min_matches]
+Every pair of cameras found at the last launch (the camera cache, or
+camera_feeds before the first launch) is compared and the overlapping pairs
+are written to camera_overlaps for cross-camera duplicate suppression,
+named by device identity so they survive cameras being renumbered.
+"""
+
+
+def grab_frame(device):
+    cap = cv2.VideoCapture(device, cv2.CAP_V4L2)
+    try:
+        # Let auto exposure settle before keeping a frame
+        frame = None
+        for _ in range(10):
+            ret, frame = cap.read()
+            if not ret:
+                return None
+        return frame
+    finally:
+        cap.release()
+
+
+def main():
+    min_matches = int(sys.argv[1]) if len(sys.argv) > 1 else 25
+    constants_manager = ConstantsManager(filename=current_settings_route)
+    cache = CameraCache(constants_manager.get_constant("camera_cache_file", "camera_cache.json"))
+    devices = cache.devices() or constants_manager.get_constant("camera_feeds")
+    identities = device_identities()
+
+    # identity -> (device, frame)
+    frames = {}
+    for device in devices:
+        frame = grab_frame(device)
+        if frame is None:
+            print(f"No frame from {device}, skipped")
+            continue
+        frames[identities.get(device, device)] = (device, frame)
+
+    overlaps = []
+    for identity_a, identity_b in itertools.combinations(frames, 2):
+        (device_a, frame_a), (device_b, frame_b) = frames[identity_a], frames[identity_b]
+        homography = estimate_overlap(frame_a, frame_b, min_matches)
+        if homography is None:
+            print(f"{device_a} / {device_b}: no overlap")
+            continue
+        print(f"{device_a} / {device_b}: overlap found")
+        overlaps.append({"a": identity_a, "b": identity_b, "homography": homography})
+
+    constants_manager.set_constant("camera_overlaps", overlaps)
+    print(f"Saved {len(overlaps)} overlapping pairs to camera_overlaps")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import copy
 import os
 import json
 
@@ -13,6 +14,7 @@ class ConstantsManager:
     "default_distance": 1,
     "default_resolution": "1920x1080 pixels",
     "default_segmentation": 16,
+    "segmentation_overlap": 0.15,
     "camera_feeds": ["/dev/video0", "/dev/video1", "/dev/video2", "/dev/video3","/dev/video4","/dev/video5"],
     "gps_name": "/dev/ttyACM0",
     "gps_baud_rate": 115200,
@@ -28,6 +30,53 @@ class ConstantsManager:
     "notes1": "",
     "notes2": "",
     "path_to_model": "",
+    "detector_backend": "auto",
+    "cpu_threads": 4,
+    "cpu_max_batch": 8,
+    "cpu_model_precision": "fp32",
+    "detection_stride": 1,
+    "tracker_max_age": 5,
+    "tracker_min_hits": 1,
+    "tracker_iou_threshold": 0.3,
+    "alert_on_new_tracks": true,
+    "tile_change_gating": false,
+    "tile_change_threshold": 6.0,
+    "tile_refresh_interval": 10,
+    "tile_budget": 0,
+    "tile_priority_fraction": 0.5,
+    "tile_hot_frames": 5,
+    "frozen_frame_limit": 30,
+    "camera_probe_workers": 4,
+    "camera_probe_timeout": 5.0,
+    "camera_fps": 30,
+    "camera_cache_file": "camera_cache.json",
+    "raw_mjpeg_capture": false,
+    "camera_masks": {},
+    "camera_mask_dir": "masks",
+    "auto_horizon_mask": false,
+    "camera_overlaps": [],
+    "cross_camera_window": 0.5,
+    "cross_camera_iou": 0.3,
+    "quality_gate": false,
+    "quality_min_sharpness": 30.0,
+    "quality_max_clipped": 0.4,
+    "quality_max_skips": 5,
+    "selected_targets_only": false,
+    "always_on_targets": ["person"],
+    "cascade_mode": false,
+    "cascade_proposal_threshold": 0.1,
+    "cascade_padding": 0.5,
+    "cascade_max_crops": 8,
+    "multi_scale_mode": false,
+    "multi_scale_levels": 3,
+    "multi_scale_grid": [3, 3],
+    "class_size_limits": {},
+    "min_object_pixels": 12,
+    "auto_tune": false,
+    "target_detection_fps": 10,
+    "auto_tune_max_segments": 25,
+    "auto_tune_max_stride": 6,
+    "detection_resolutions": ["640x360 pixels", "960x540 pixels", "1280x720 pixels", "1920x1080 pixels", "2560x1440 pixels"],
     "path_to_labels": "",
     "default_targets": {
         "BACKGROUND": {"color": "(255, 255, 255)", "threshold": "0.1"},
@@ -84,6 +133,8 @@ class ConstantsManager:
     "operator_comments": ""
     }
     """
+    # Shipped defaults, also used for keys missing from an older settings file
+    DEFAULTS = json.loads(BACKUP_JSON_STRING)
 
     def __init__(self, filename="settings.json"):
         """
@@ -128,16 +179,21 @@ class ConstantsManager:
 
     def get_constant(self, key, default=None):
         """
-        Gets the value of a constant.
+        Gets the value of a constant. A key missing from the JSON file, e.g.
+        one added after the file was created, takes its value from
+        BACKUP_JSON_STRING, so every install runs with the same defaults.
 
         Args:
             key (str): The key of the constant
+            default (any, optional): Value for a key that has no shipped default either
 
         Returns:
-            The value of the constant (None if the constant does not exist)
+            The value of the constant (default if the constant does not exist)
 
         """
-        return self.constants.get(key, default)
+        if key in self.constants:
+            return self.constants[key]
+        return copy.deepcopy(self.DEFAULTS.get(key, default))
 
     def set_constant(self, key, value):
         """
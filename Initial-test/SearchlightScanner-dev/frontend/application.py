@@ -4,12 +4,16 @@ from .application_color_scheme import color_scheme
 from .camera_frame import MainFrame
 from .settings1 import SettingsFrame1
 from .settings2 import SettingsFrame2
+import queue
+import threading
 import tkinter as tk
 import cv2
 from backend.video_source import CameraManager
-from backend.cam_utils import find_working_cameras
+from backend.cam_utils import CameraCache, device_identities, find_working_cameras, revalidate_cameras
 import platform
 from backend.image_processor import ImageProcessor
+from backend.auto_tuner import AutoTuner
+from backend.camera_mask import CameraMask, HorizonMaskLearner
 from backend.gps_manager import GPSManager
 from .application_current_settings_route import current_settings_route
 from constants.constantsmanager import ConstantsManager
@@ -28,7 +32,40 @@ class Application(tk.Tk):
         super().__init__()
         self.constants_manager = ConstantsManager(filename=current_settings_route)
         self.model_path = self.resolve_model_path()
-        self.ai = ImageProcessor(model_path=self.model_path)
+        self.ai = ImageProcessor(
+            model_path=self.model_path,
+            backend=self.constants_manager.get_constant("detector_backend", "auto"),
+            threads=self.constants_manager.get_constant("cpu_threads", 4),
+            max_batch=self.constants_manager.get_constant("cpu_max_batch", 8),
+            precision=self.constants_manager.get_constant("cpu_model_precision", "fp32"),
+        )
+        self.ai.set_change_gating(
+            self.constants_manager.get_constant("tile_change_gating", False),
+            threshold=self.constants_manager.get_constant("tile_change_threshold", 6.0),
+            refresh_interval=self.constants_manager.get_constant("tile_refresh_interval", 10),
+        )
+        self.ai.set_tile_budget(
+            self.constants_manager.get_constant("tile_budget", 0),
+            priority_fraction=self.constants_manager.get_constant("tile_priority_fraction", 0.5),
+            hot_frames=self.constants_manager.get_constant("tile_hot_frames", 5),
+        )
+        self.ai.set_target_filter(
+            self.constants_manager.get_constant("selected_targets_only", False),
+            always_on=self.constants_manager.get_constant("always_on_targets", ["person"]),
+        )
+        self.ai.set_cascade(
+            self.constants_manager.get_constant("cascade_mode", False),
+            proposal_threshold=self.constants_manager.get_constant("cascade_proposal_threshold", 0.1),
+            padding=self.constants_manager.get_constant("cascade_padding", 0.5),
+            max_crops=self.constants_manager.get_constant("cascade_max_crops", 8),
+        )
+        self.ai.set_multi_scale(
+            self.constants_manager.get_constant("multi_scale_mode", False),
+            scales=self.constants_manager.get_constant("multi_scale_levels", 3),
+            fine_grid=self.constants_manager.get_constant("multi_scale_grid", [3, 3]),
+            size_limits=self.constants_manager.get_constant("class_size_limits", {}),
+            min_object=self.constants_manager.get_constant("min_object_pixels", 12),
+        )
         self.color_scheme = color_scheme
         self.title("SearchLightScanner")
         self.update_colors()
@@ -40,12 +77,30 @@ class Application(tk.Tk):
             self.constants_manager.get_constant("default_resolution")
         )
 
-        working_cams = find_working_cameras(desired_resolutions=[(width, height)], max_cams=6, max_devices=12)
-        print("Detected working cameras:", working_cams)
-
-        self.constants_manager.set_constant("camera_feeds", working_cams)
-
-        self.camera_feeds = [CameraManager(cam, width, height) for cam in working_cams]
+        self.camera_cache = CameraCache(self.constants_manager.get_constant("camera_cache_file", "camera_cache.json"))
+        fps = self.constants_manager.get_constant("camera_fps", 30)
+        probes = find_working_cameras(
+            desired_resolutions=[(width, height)], max_cams=6, max_devices=12, fps=fps,
+            workers=self.constants_manager.get_constant("camera_probe_workers", 4),
+            timeout=self.constants_manager.get_constant("camera_probe_timeout", 5.0),
+            cache=self.camera_cache,
+        )
+        print("Detected working cameras:", probes)
+        identities = device_identities()
+        camera_identities = [identities.get(probe.device, probe.device) for probe in probes]
+
+        stall_frames = self.constants_manager.get_constant("frozen_frame_limit", 30)
+        raw_mjpeg = self.constants_manager.get_constant("raw_mjpeg_capture", False)
+        self.camera_feeds = [
+            CameraManager(probe.device, probe.width, probe.height, stall_frames, codec=probe.codec,
+                          fps=fps, raw_mjpeg=raw_mjpeg)
+            for probe in probes
+        ]
+        # Results of background threads, applied on the UI thread by poll_background_results
+        self.reprobed_cameras = queue.Queue()
+        self.learned_masks = queue.Queue()
+        self.load_camera_masks(camera_identities)
+        self.start_camera_revalidation(probes, (width, height))
 
         self.gps_manager = GPSManager()
 
@@ -63,8 +118,121 @@ class Application(tk.Tk):
             self.frames[F] = frame
             frame.pack(fill="both", expand=True)
 
+        self.main_frame.auto_tuner = self.create_auto_tuner()
+
         self.switch_frame(MainFrame)
         self.maximize_window()
+        self.poll_background_results()
+
+    def start_camera_revalidation(self, probes, resolution):
+        """
+        Check in the background that cameras opened from the camera cache
+        really deliver frames. Failed cameras are probed again and handed
+        to the UI thread through `reprobed_cameras`, which reopens them
+        with whatever they negotiated.
+        """
+        cached = [(camera, probe) for camera, probe in zip(self.camera_feeds, probes) if probe.cached]
+        if not cached:
+            return
+
+        def revalidate():
+            failed = revalidate_cameras(
+                cached, self.camera_cache, [resolution],
+                timeout=self.constants_manager.get_constant("camera_probe_timeout", 5.0),
+                fps=self.constants_manager.get_constant("camera_fps", 30),
+            )
+            for camera, probe in failed:
+                if probe is not None:
+                    self.reprobed_cameras.put((camera, probe))
+
+        threading.Thread(target=revalidate, daemon=True).start()
+
+    def poll_background_results(self):
+        """
+        Apply what background threads queued for the UI thread. Tkinter
+        must only be used from the UI thread, so they never call it
+        themselves.
+        """
+        while True:
+            try:
+                camera, probe = self.reprobed_cameras.get_nowait()
+            except queue.Empty:
+                break
+            camera.change_camera(probe.device, probe.width, probe.height, probe.codec)
+        while True:
+            try:
+                identity, mask = self.learned_masks.get_nowait()
+            except queue.Empty:
+                break
+            self.save_camera_mask(identity, mask)
+        self.after(250, self.poll_background_results)
+
+    def set_capture_resolution(self, pixels):
+        """
+        Save `pixels` ("WxH pixels") as `default_resolution` and switch every
+        camera to it while running. Each capture thread renegotiates on its
+        own; the detector and displays follow with the first frame at the
+        new size.
+        """
+        width, height = get_resolution(pixels)
+        self.constants_manager.set_constant("default_resolution", pixels)
+        for camera in self.camera_feeds:
+            camera.reconfigure(width=width, height=height)
+
+    def load_camera_masks(self, camera_identities):
+        """
+        Apply the persisted mask of every camera, keyed by its device
+        identity (see cam_utils.device_identities) in `camera_masks`, so a
+        mask stays with its camera whichever /dev/videoN it enumerates as.
+        Cameras without one learn a horizon mask when `auto_horizon_mask`
+        is on. Masks are learned on the detection thread, so they are
+        queued on `learned_masks` and saved from the UI thread.
+        """
+        masks = self.constants_manager.get_constant("camera_masks", {})
+        auto_horizon = self.constants_manager.get_constant("auto_horizon_mask", False)
+        for camera_id, identity in enumerate(camera_identities):
+            mask = CameraMask.load(masks[identity]) if identity in masks else None
+            if mask is not None:
+                print(f"[Application] Using mask {masks[identity]} for {identity}")
+                self.ai.set_camera_mask(camera_id, mask)
+            elif auto_horizon:
+                self.ai.learn_horizon_mask(camera_id, HorizonMaskLearner())
+        self.ai.on_mask_learned = lambda camera_id, mask: self.learned_masks.put((camera_identities[camera_id], mask))
+
+    def save_camera_mask(self, identity, mask):
+        """
+        Persist a camera's mask next to the others and record it in `camera_masks`.
+        """
+        mask_dir = self.constants_manager.get_constant("camera_mask_dir", "masks")
+        path = str(Path(mask_dir) / (identity.strip("/").replace("/", "_") + ".png"))
+        mask.save(path)
+        masks = self.constants_manager.get_constant("camera_masks", {})
+        masks[identity] = path
+        self.constants_manager.set_constant("camera_masks", masks)
+
+    def create_auto_tuner(self):
+        """
+        Build the controller that tunes the grid, detection size and strides
+        to hold `target_detection_fps`. Candidate detection sizes come from
+        `detection_resolutions`, in the same "WxH pixels" form as
+        `default_resolution`. Sizes above the capture resolution are
+        skipped by the tuner itself, so all of them are kept in case the
+        resolution is raised later.
+        """
+        resolutions = [
+            get_resolution(pixels)
+            for pixels in self.constants_manager.get_constant("detection_resolutions")
+        ]
+        auto_tuner = AutoTuner(
+            self.ai,
+            self.main_frame.detection_worker,
+            target_fps=self.constants_manager.get_constant("target_detection_fps", 10),
+            resolutions=resolutions,
+            max_segments=self.constants_manager.get_constant("auto_tune_max_segments", 25),
+            max_stride=self.constants_manager.get_constant("auto_tune_max_stride", 6),
+        )
+        auto_tuner.set_enabled(self.constants_manager.get_constant("auto_tune", False))
+        return auto_tuner
 
     def update_colors(self):
         mode = "dark" if self.color_scheme["dark_mode"] else "light"
@@ -96,6 +264,8 @@ class Application(tk.Tk):
         self.switch_frame(SettingsFrame1)
 
     def switch_settings2(self):
+        # Strides and the shared tile budget change while running
+        self.frames[SettingsFrame2].update_revisit_label()
         self.switch_frame(SettingsFrame2)
 
     def switch_main_frame(self):
@@ -122,6 +292,7 @@ class Application(tk.Tk):
 
         if MainFrame in self.frames:
             self.frames[MainFrame].stop_camera_feed()
+            self.frames[MainFrame].detection_worker.stop()
             self.frames[MainFrame].sound_manager.stop()
             self.frames[MainFrame].saver.stop()
 
@@ -138,13 +309,18 @@ class Application(tk.Tk):
         self.minsize(1280, 720)
 
     def resolve_model_path(self):
-        custom_model = Path(
-            "/home/sar/SearchlightScannerV4/Initial-test/SearchlightScanner-dev/models/ssd-mobilenet.onnx")
-        if custom_model.exists():
-            print(f"✅ Using model at: {custom_model}")
-            return str(custom_model)
-
-        raise FileNotFoundError(f"❌ Model not found at: {custom_model}")
+        candidates = [
+            self.constants_manager.get_constant("path_to_model", ""),
+            "/home/sar/SearchlightScannerV4/Initial-test/SearchlightScanner-dev/models/ssd-mobilenet.onnx",
+            # Relative to the checkout, for ground-station installs outside /home/sar
+            Path(__file__).resolve().parent.parent / "models" / "ssd-mobilenet.onnx",
+        ]
+        for candidate in candidates:
+            if candidate and Path(candidate).exists():
+                print(f"✅ Using model at: {candidate}")
+                return str(candidate)
+
+        raise FileNotFoundError(f"❌ Model not found at: {candidates[1]}")
 
 
 if __name__ == "__main__":
@@ -1,7 +1,6 @@
 import tkinter as tk
 from PIL import Image, ImageTk
 from tkinter import font as tkFont, ttk
-import jetson_utils
 from PIL import Image
 from backend.led_controller import LEDController
 
@@ -12,12 +11,16 @@ from .settings1 import CustomSlider
 # from backend.image_processor import ImageProcessor
 from backend.sound_manager import SoundManager
 from backend.image_saver import ImageSaver
+from backend.detection_worker import DetectionWorker
+from backend.frame_pyramid import FramePyramid
+from backend.frame_quality import FrameQualityScorer
+from backend.camera_overlap import CrossCameraAssociator
+from backend.cam_utils import device_identities
 from .shared_labels_controller import shared_labels
 from .shared_segmentation_controller import shared_segmentation
 import numpy as np
 import datetime
 import cv2
-from jetson_utils import cudaFromNumpy, cudaToNumpy
 
 
 class MainFrame(tk.Frame):
@@ -33,6 +36,9 @@ class MainFrame(tk.Frame):
         self.parent = parent
         self.gps_manager = gps_manager
         self.camera_feeds = camera_feeds
+        self.last_frame_ids = {}
+        # camera index -> display image reused between frames
+        self.display_buffers = {}
         shared_confidence.register_observer(self.update_confidence)
         self.fullscreen_mode = None
         self.create_widgets()
@@ -41,6 +47,32 @@ class MainFrame(tk.Frame):
         self.saver = ImageSaver({})
         self.saver.start()
         self.led_controller = LEDController()
+        constants = self.parent.constants_manager
+        quality_scorer = None
+        if constants.get_constant("quality_gate", False):
+            quality_scorer = FrameQualityScorer(
+                min_sharpness=constants.get_constant("quality_min_sharpness", 30.0),
+                max_clipped=constants.get_constant("quality_max_clipped", 0.4),
+            )
+        self.detection_worker = DetectionWorker(
+            self.parent.ai,
+            len(camera_feeds),
+            stride=constants.get_constant("detection_stride", 1),
+            tracker_params={
+                "max_age": constants.get_constant("tracker_max_age", 5),
+                "min_hits": constants.get_constant("tracker_min_hits", 1),
+                "iou_threshold": constants.get_constant("tracker_iou_threshold", 0.3),
+            },
+            quality_scorer=quality_scorer,
+            max_low_quality_skips=constants.get_constant("quality_max_skips", 5),
+        )
+        self.associator = self.create_associator(constants)
+        # Alert and save once per new track instead of on every frame with detections
+        self.alert_on_new_tracks = constants.get_constant("alert_on_new_tracks", True)
+        self.detection_worker.start()
+        # Set by the Application once the worker exists, see Application.create_auto_tuner
+        self.auto_tuner = None
+        self.max_overlay_age = 1.0  # seconds before stale boxes stop being drawn
         self.create_confidence_controls()
         shared_labels.add_observer(self.on_threshold_change)
 
@@ -467,20 +499,20 @@ class MainFrame(tk.Frame):
     def update_frame(self):
         if self.update_camera:
             try:
-                detections = []
-                img_np = None
-
-                # Get current layout mode
-                layout_mode = self.parent.constants_manager.get_constant("camera_layout", "split")
-
+                live_cameras = 0
                 for inx, camera in enumerate(self.camera_feeds):
+                    # Keep the last image up while the capture thread switches modes
+                    if camera.is_reconfiguring():
+                        live_cameras += 1
+                        continue
                     if not camera.is_connected():
                         self.camera_labels[inx].config(image="", text='Not Connected')
                         continue
 
-                    ret, frame = camera.read()
+                    frame_id, timestamp, frame = camera.get_latest()
 
-                    if not ret or frame is None or frame.shape[0] < 100:
+                    # The capture thread only stores usable frames
+                    if frame is None:
                         self.camera_labels[inx].config(
                             image="",
                             text="No Feed\n(Connected, but no signal)",
@@ -489,7 +521,25 @@ class MainFrame(tk.Frame):
                         )
                         continue
 
-                    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                    # Repeated frames never get a new id, so nothing is
+                    # re-detected; a camera stuck on one buffer is flagged
+                    if camera.is_stalled():
+                        self.camera_labels[inx].config(
+                            image="",
+                            text="Feed Frozen\n(Camera repeating the same frame)",
+                            fg="red",
+                            font=("Helvetica", 16, "bold")
+                        )
+                        continue
+                    live_cameras += 1
+
+                    # Nothing new from the capture thread since the last tick
+                    if self.last_frame_ids.get(inx) == frame_id:
+                        continue
+                    self.last_frame_ids[inx] = frame_id
+
+                    pyramid = FramePyramid(frame, timestamp)
+                    self.detection_worker.submit(inx, frame_id, timestamp, pyramid)
 
                     # Determine target size
                     layout_mode = self.parent.constants_manager.get_constant("camera_layout", "split")
@@ -503,11 +553,17 @@ class MainFrame(tk.Frame):
                         target_width = self.winfo_width() // cols
                         target_height = (self.winfo_height() - self.menu_options_frame.winfo_height()) // rows
 
-                    frame = cv2.resize(frame, (target_width, target_height))
-                    cuda_frame = cudaFromNumpy(frame)
-
-                    cam_detections = self.parent.ai.detect(cuda_frame)
-                    img_np = cudaToNumpy(cuda_frame)
+                    # Pyramid levels are shared with the worker, overlays go on
+                    # a per-camera display buffer reused while the size holds
+                    level = pyramid.resized(target_width, target_height)
+                    img_np = self.display_buffers.get(inx)
+                    if img_np is None or img_np.shape != level.shape:
+                        img_np = np.empty_like(level)
+                        self.display_buffers[inx] = img_np
+                    np.copyto(img_np, level)
+                    result = self.detection_worker.get_latest_result(inx)
+                    if result is not None and result.age() < self.max_overlay_age:
+                        self.draw_detections(img_np, result)
 
                     img_pil = Image.fromarray(img_np)
                     photo = ImageTk.PhotoImage(image=img_pil)
@@ -515,19 +571,94 @@ class MainFrame(tk.Frame):
                     self.camera_labels[inx].image = photo  # prevent GC
                     self.camera_labels[inx].update_idletasks()
 
-                    if cam_detections:
-                        if cam_detections:
-                            print(f"Detections from camera {inx + 1}: {len(cam_detections)}")
-                            self.handle_detections(cam_detections, img_np, camera_id=inx)
+                for result in self.detection_worker.get_results():
+                    alerts = result.new_tracks if self.alert_on_new_tracks else result.detections
+                    if alerts and result.inferred:
+                        self.associator.push(result, alerts)
+
+                # Overlapping cameras seeing the same target alert once, from the best view
+                for result, alerts in self.associator.pop_ready():
+                    if not len(alerts):
+                        continue
+                    print(f"Detections from camera {result.camera_id + 1}: {len(result.detections)} "
+                          f"({len(result.new_tracks)} new tracks, tiles run/skipped: {result.tile_stats}, "
+                          f"cascade: {self.format_cascade_stats(result.cascade_stats)}, quality: {result.quality})")
+                    # The saver thread decodes the full resolution frame, and only if it keeps it
+                    self.handle_detections(result.detections, result.pyramid, camera_id=result.camera_id,
+                                           quality=result.quality, alerts=alerts)
+
+                # Stalled and disconnected cameras give their tiles to live ones
+                self.parent.ai.share_tile_budget(live_cameras, len(self.camera_feeds))
+
+                if self.auto_tuner is not None:
+                    self.auto_tuner.tick()
 
             except Exception as e:
                 print(f"Camera processing error: {str(e)}")
 
             self.after(30, self.update_frame)  # ~30 FPS
 
-    def handle_detections(self, detections, img, camera_id=None):
+    def create_associator(self, constants):
+        """
+        Build the cross-camera associator from the rig calibration in
+        `camera_overlaps`, written by calibrate_overlaps.py. Entries name
+        both cameras by device identity, resolved here to the cameras'
+        current devices, so they survive renumbering and order changes.
+        """
+        identities = device_identities()
+        camera_ids = {
+            identities.get(camera.source, camera.source): inx for inx, camera in enumerate(self.camera_feeds)
+        }
+        overlaps = {}
+        for entry in constants.get_constant("camera_overlaps", []):
+            if entry["a"] in camera_ids and entry["b"] in camera_ids:
+                overlaps[(camera_ids[entry["a"]], camera_ids[entry["b"]])] = entry["homography"]
+        return CrossCameraAssociator(
+            overlaps,
+            window=constants.get_constant("cross_camera_window", 0.5),
+            iou_threshold=constants.get_constant("cross_camera_iou", 0.3),
+        )
+
+    @staticmethod
+    def format_cascade_stats(stats):
+        if stats is None:
+            return "off"
+        return (f"{stats['crops']} crops, proposal {stats['proposal_ms']:.1f} ms, "
+                f"refine {stats['refine_ms']:.1f} ms")
+
+    def draw_detections(self, img, result):
+        """
+        Draw the boxes of a detection result onto a display frame. Boxes are
+        kept in full resolution coordinates and only scaled here.
+        """
+        scale_x = img.shape[1] / result.pyramid.width
+        scale_y = img.shape[0] / result.pyramid.height
+        boxes = (result.detections.boxes * (scale_x, scale_y, scale_x, scale_y)).astype(int)
+        for detection, (left, top, right, bottom) in zip(result.detections, boxes):
+            color = shared_labels.get_color(detection.label)
+            p1 = (int(left), int(top))
+            p2 = (int(right), int(bottom))
+            cv2.rectangle(img, p1, p2, color, 2)
+            cv2.putText(
+                img,
+                f"{detection.label} {detection.conf:.2f}",
+                (p1[0], max(p1[1] - 5, 10)),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.5,
+                color,
+                1,
+            )
+
+    def handle_detections(self, detections, img, camera_id=None, quality=None, alerts=None):
+        """
+        Alert on a result and queue its frame for saving. The LED and sound
+        go off for `alerts`, the detections that survived cross-camera
+        suppression (all of `detections` when not given); the saved frame
+        keeps every detection. `img` is the frame's FramePyramid or an
+        RGB array.
+        """
         self.led_controller.flash_led()
-        self.sound_manager.play_sound(detections)
+        self.sound_manager.play_sound(detections if alerts is None else alerts)
         try:
             lat, lon = self.gps_manager.get_coords()
             altitude = self.gps_manager.get_latest_altitude()
@@ -546,7 +677,7 @@ class MainFrame(tk.Frame):
         except ValueError:
             gps_coords = None
 
-        self.saver.add_image(img, detections, gps_coords)
+        self.saver.add_image(img, detections, gps_coords, quality)
 
     def start_gps_thread(self):
         self.gps_manager.start()
@@ -83,7 +83,9 @@ class SettingsFrame1(tk.Frame):
         self.resolution_label = tk.Label(self.resolution_section, text="Select Resolution", font=font_used)
         self.resolution_label.pack(anchor="w", pady=10)
 
-        selected_option = tk.StringVar(value="1920x1080 pixels")
+        selected_option = tk.StringVar(
+            value=self.constants_manager.get_constant("default_resolution", "1920x1080 pixels")
+        )
         options = ["1280x720 pixels", "1920x1080 pixels", "2560x1440 pixels", "3840x2160 pixels"]
         self.option_menu = ttk.OptionMenu(self.resolution_section, selected_option, selected_option.get(), *options,
                                           command=self.selection_changed)
@@ -299,7 +301,7 @@ class SettingsFrame1(tk.Frame):
         self.update_camera_buttons()
 
     def selection_changed(self, value):
-        print(f"I DO NOTHING FOR NOW {value}")
+        self.application.set_capture_resolution(value)
 
     def save_notes_input(self):
         input_value = self.text_field.get(
@@ -110,6 +110,11 @@ class SettingsFrame2(tk.Frame):
             fg=color_scheme["label_font_color/fg"],
         )
 
+        self.revisit_label.configure(
+            bg=color_scheme["application/window_and_frame_color"],
+            fg=color_scheme["label_font_color/fg"],
+        )
+
         self.segmentation_toggle_frame.configure(
             bg=color_scheme["application/window_and_frame_color"],
             highlightbackground=color_scheme["frame_outline_color"],
@@ -183,6 +188,7 @@ class SettingsFrame2(tk.Frame):
     ):
         switch_state["is_on"] = not switch_state["is_on"]
         self.update_colors()
+        shared_segmentation.set_enabled(switch_state["is_on"])
 
     def set_button_active(self, selected_button):
         mode = "dark" if self.color_scheme["dark_mode"] else "light"
@@ -194,6 +200,20 @@ class SettingsFrame2(tk.Frame):
         # Set the clicked button to green
         selected_button.config(bg=selected_color)
 
+    def update_revisit_label(self):
+        """
+        Show the worst-case number of camera frames before every tile of
+        the selected grid has been looked at once, for the slowest camera's
+        inference stride.
+        """
+        stride = max(self.parent.main_frame.detection_worker.strides, default=1)
+        interval = self.parent.ai.tile_revisit_interval(shared_segmentation.get_current(), stride)
+        if interval <= 1:
+            self.revisit_label.config(text="Every segment checked every camera frame")
+        else:
+            self.revisit_label.config(
+                text=f"Every segment checked at least once every {interval} camera frames")
+
     def toggle_segment_visibility(self, show):
         if show:
             self.segments_frame.grid(row=0, column=1, padx=10, pady=5, sticky="nes")
@@ -296,11 +316,33 @@ class SettingsFrame2(tk.Frame):
             button.grid(row=(i // 2) + 1, column=i % 2, sticky="ew", padx=5, pady=8)
             button.config(
                 command=lambda b=button, s=segment: (
-                    self.set_button_active(b), shared_segmentation.set_current(s)))
+                    self.set_button_active(b), shared_segmentation.set_current(s),
+                    self.update_revisit_label()))
             self.segment_buttons[segment] = button
             if segment == 9:
                 self.set_button_active(button)
 
+        # Hands the grid back to the auto tuner after a manual choice
+        self.auto_segment_button = tk.Button(
+            self.segments_frame, bg="#697283", fg="white", text="Auto",
+            font=font_used, width=30, height=3)
+        self.auto_segment_button.grid(
+            row=(len(segments) // 2) + 1, column=len(segments) % 2, sticky="ew", padx=5, pady=8)
+        self.auto_segment_button.config(
+            command=lambda: (
+                self.set_button_active(self.auto_segment_button),
+                shared_segmentation.clear_operator_override(),
+                self.update_revisit_label()))
+        self.segment_buttons["auto"] = self.auto_segment_button
+        if not shared_segmentation.has_operator_override():
+            self.set_button_active(self.auto_segment_button)
+
+        self.revisit_label = tk.Label(
+            self.segments_frame, text="", bg="#7C889C", fg="black", font=font_used)
+        self.revisit_label.grid(
+            row=(len(segments) + 2) // 2 + 1, column=0, columnspan=2, padx=10, pady=10)
+        self.update_revisit_label()
+
         self.segmentation_toggle_frame = tk.Frame(
             self, bg="#7C889C", highlightbackground="black", highlightcolor="black",
             highlightthickness=2, width=900, height=120)
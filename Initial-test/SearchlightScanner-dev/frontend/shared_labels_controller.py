@@ -34,6 +34,7 @@ class SharedLabels:
         self.constants_manager = ConstantsManager(filename=current_settings_route)
         self.selected_labels = {}
         self.observers = []
+        self.selection_observers = []
 
         self.labels = {
             "BACKGROUND": {"color": (255, 255, 255), "threshold": 0.1},
@@ -85,6 +86,15 @@ class SharedLabels:
         for callback in self.observers:
             callback(label, threshold)
 
+    def add_selection_observer(self, callback):
+        """
+        Add a callback run with the new selection whenever the operator
+        changes the priority targets.
+        :param callback: The observer callback function to be added.
+        :return: None
+        """
+        self.selection_observers.append(callback)
+
     def get_threshold(self, label):
         # print(f"Getting threshold for {label}: {self.thresholds.get(label, 0.5)}")
         return max(0.02, self.thresholds.get(label, 0.5))
@@ -108,6 +118,8 @@ class SharedLabels:
     def set_selected_labels(self, labels):
         self.selected_labels = labels
         self.constants_manager.set_constant("selected_labels", labels)
+        for callback in self.selection_observers:
+            callback(labels)
 
     def get_all_labels(self):
         return self.labels
@@ -1,5 +1,10 @@
+from constants.constantsmanager import ConstantsManager
+from frontend.application_current_settings_route import current_settings_route
+
+
 class SharedSegmentation:
     def __init__(self):
+        self.constants_manager = ConstantsManager(filename=current_settings_route)
         self._options = {
             1: None,
             4: (2, 2),
@@ -13,6 +18,11 @@ class SharedSegmentation:
             84: (7, 12),
         }
         self._current = self._options[9]
+        self._enabled = True
+        # Set when the operator picks a grid, the auto tuner leaves the grid alone until cleared
+        self._operator_override = False
+        # Fraction of each tile shared with its neighbours
+        self._overlap = float(self.constants_manager.get_constant("segmentation_overlap", 0.15))
 
     def get_options(self):
         return self._options
@@ -20,9 +30,56 @@ class SharedSegmentation:
     def get_current(self):
         return self._current
 
-    def set_current(self, new_value):
+    def get_current_segments(self):
+        """
+        Returns:
+            int: Key of the current grid in the options table
+        """
+        for segments, grid in self._options.items():
+            if grid == self._current:
+                return segments
+        return 1
+
+    def set_current(self, new_value, operator=True):
+        """
+        Args:
+            new_value (int): Number of segments, a key of the options table
+            operator (bool): True when the operator chose the grid, which
+                stops the auto tuner from changing it
+        """
         print("SharedSegmentation: set_current:", self._options[new_value])
         self._current = self._options[new_value]
+        if operator:
+            self._operator_override = True
+
+    def has_operator_override(self):
+        return self._operator_override
+
+    def clear_operator_override(self):
+        print("SharedSegmentation: grid handed back to the auto tuner")
+        self._operator_override = False
+
+    def is_enabled(self):
+        return self._enabled
+
+    def set_enabled(self, enabled):
+        print("SharedSegmentation: set_enabled:", enabled)
+        self._enabled = enabled
+
+    def get_active_grid(self):
+        """
+        Returns:
+            tuple: The grid the live pipeline should run, None for whole-frame
+            detection (segmentation switched off or the 1 segment option)
+        """
+        return self._current if self._enabled else None
+
+    def get_overlap(self):
+        return self._overlap
+
+    def set_overlap(self, overlap):
+        self._overlap = min(max(float(overlap), 0.0), 0.5)
+        self.constants_manager.set_constant("segmentation_overlap", self._overlap)
 
 
 # This will be the shared instance
@@ -0,0 +1,55 @@
+import argparse
+from pathlib import Path
+
+from backend.detector_backends import precision_model_path
+from backend.image_processor import ImageProcessor
+from backend.model_quantizer import (
+    compare_models,
+    convert_fp16,
+    format_report,
+    quantize_int8,
+)
+
+"""
+Build reduced precision versions of the detector for the CPU backend and
+compare them with the FP32 model:
+    python3 quantize_model.py models/ssd-mobilenet.onnx DET0 --precision int8 --report
+The converted model is saved next to the original (ssd-mobilenet.int8.onnx)
+and picked up by setting cpu_model_precision to "int8" or "fp16".
+--report replays the images through every available precision and prints
+ms/frame, FPS and agreement with the FP32 detections.
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantise the detector model for CPU inference")
+    parser.add_argument("model", help="FP32 ONNX model")
+    parser.add_argument("image_dir", help="Saved images to calibrate on and replay, e.g. DET0")
+    parser.add_argument("--precision", choices=("int8", "fp16"), action="append",
+                        help="Precision to build, repeat for both (default int8)")
+    parser.add_argument("--report", action="store_true", help="Compare speed and accuracy against FP32")
+    parser.add_argument("--threads", type=int, default=4, help="CPU threads for the report")
+    parser.add_argument("--replay-dir", help="Images for the report, defaults to image_dir")
+    args = parser.parse_args()
+
+    for precision in args.precision or ["int8"]:
+        if precision == "int8":
+            quantize_int8(args.model, args.image_dir)
+        else:
+            convert_fp16(args.model)
+
+    if not args.report:
+        return
+    processors = {}
+    for precision in ("fp32", "fp16", "int8"):
+        if not Path(precision_model_path(args.model, precision)).exists():
+            continue
+        processors[precision] = ImageProcessor(
+            model_path=args.model, backend="cpu", threads=args.threads, precision=precision,
+        )
+    rows = compare_models(processors, args.replay_dir or args.image_dir)
+    print(format_report(rows))
+
+
+if __name__ == "__main__":
+    main()